@@ -3,10 +3,10 @@ import ollama
 import pandas as pd
 import json
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from litellm import completion
 
-from data import load_sections, load_dynamic_df, build_system_profile, take_ai_snapshot, build_full_raw_text, get_bios_context, get_redfish_groups, build_redfish_context, count_tokens
+from data import load_sections, load_metric_registry, build_system_profile, take_ai_snapshot, build_full_raw_text, get_bios_context, get_redfish_groups, build_redfish_context, count_tokens, get_history_stores
 
 # TODO: Generic AI calls
 
@@ -201,7 +201,7 @@ def get_ai_threshold():
 
     # TODO: Load dynamic_single metrics
 
-    dynamic_df = load_dynamic_df()
+    registry = load_metric_registry()
     monitored_metrics = st.session_state.get("monitored_metrics", [])
 
     # TODO: Hardware profile
@@ -218,8 +218,8 @@ def get_ai_threshold():
 
     with col_refresh:
         if st.button("Get Snapshot for AI (better recommendations)", use_container_width=True, key="ai_refresh_snapshot", type="primary"):
-            if monitored_metrics and not dynamic_df.empty:
-                snapshot = take_ai_snapshot(dynamic_df, monitored_metrics)
+            if monitored_metrics and len(registry):
+                snapshot = take_ai_snapshot(registry, monitored_metrics)
                 st.session_state.ai_snapshot = snapshot
                 st.success(f"✅ Snapshot refreshed! ({len(snapshot)} metrics measured)")
                 st.rerun()
@@ -236,20 +236,27 @@ def get_ai_threshold():
     # TODO: Build monitored metrics context (inlined - simple & clean)
 
     context_lines = []
+    _, rollups = get_history_stores()
+    day_ago = datetime.now() - timedelta(hours=24)
 
     for subtitle in monitored_metrics:
-        row = dynamic_df[dynamic_df["Subsection_Title"] == subtitle]
-        if not row.empty:
-            r = row.iloc[0]
-            cmd = r["Command"]
-            unit = r["unit"] or "—"
-            min_str = f"{r['min_thresh']:.2f}" if pd.notna(r['min_thresh']) else "not set"
-            max_str = f"{r['max_thresh']:.2f}" if pd.notna(r['max_thresh']) else "not set"
+        spec = registry.get(subtitle)
+        if spec is not None:
+            cmd = spec.template
+            unit = spec.unit or "—"
+            min_str = f"{spec.min_thresh:.2f}" if pd.notna(spec.min_thresh) else "not set"
+            max_str = f"{spec.max_thresh:.2f}" if pd.notna(spec.max_thresh) else "not set"
             current_val = ai_snapshot.get(subtitle, "not measured yet")
-            context_lines.append(
+            line = (
                 f"- **{subtitle}**: command=`{cmd}`, unit={unit}, current={current_val}, "
                 f"existing min={min_str}, max={max_str}"
             )
+            ### Observed distribution over the last 24h (merged 1h rollup sketches)
+            if not spec.is_family and not spec.is_template:
+                pct = rollups.percentiles(subtitle, "1h", day_ago)
+                if pd.notna(pct["p50"]):
+                    line += f", last 24h p50={pct['p50']:.4g}, p99={pct['p99']:.4g}, p99.9={pct['p99.9']:.4g}"
+            context_lines.append(line)
     metrics_context = (
         "Monitored metrics (with commands and thresholds):\n" + "\n".join(context_lines)
         if context_lines else "No metrics selected yet."
@@ -336,9 +343,9 @@ def perform_hft_analysis(selected_profile, include_redfish=False, selected_redfi
     full_profile_data = build_full_raw_text(profile_sections)
 
     ## Dynamic snapshot
-    dynamic_df = load_dynamic_df()
+    registry = load_metric_registry()
     monitored = [subtitle for subs in profile_sections.values() for subtitle in subs.keys()]
-    dynamic_snapshot = take_ai_snapshot(dynamic_df, monitored) if monitored else {}
+    dynamic_snapshot = take_ai_snapshot(registry, monitored) if monitored else {}
 
     context = {
         "short_summary": full_hardware_summary,     
@@ -1037,9 +1044,9 @@ def perform_upgrade_analysis(focus_display: list, budget: float | None = None, i
 
     short_summary = build_system_profile(all_sections)
     full_profile_data = build_full_raw_text(focused_sections)
-    dynamic_df = load_dynamic_df()
+    registry = load_metric_registry()
     monitored = [sub for subs in focused_sections.values() for sub in subs]
-    dynamic_snapshot = take_ai_snapshot(dynamic_df, monitored) if monitored else {}
+    dynamic_snapshot = take_ai_snapshot(registry, monitored) if monitored else {}
 
     context = {
         "short_summary": short_summary,
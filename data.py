@@ -1,11 +1,8 @@
 import pandas as pd
 import os
-import subprocess
 import streamlit as st
 import re
 from pathlib import Path
-import requests
-from requests.auth import HTTPBasicAuth
 
 @st.cache_data(ttl="10min", show_spinner=False)
 def load_sections():
@@ -72,12 +69,16 @@ def get_sections_for_profile(profile: str):
 @st.cache_data(ttl="10min", show_spinner=False)
 def load_dynamic_df():
 
-    iface = get_default_interface()
     df = load_sections()
 
-    dyn = df[df["Type"] == "dynamic_single"].copy()
+    # dynamic_multi rows are monitored as metric families when they declare a Parser
+    parser = df.get("Parser", pd.Series([""] * len(df), index=df.index)).fillna("").astype(str).str.strip()
+    is_multi = (df["Type"] == "dynamic_multi") & (parser != "")
+    dyn = df[(df["Type"] == "dynamic_single") | is_multi].copy()
 
-    dyn["command"]   = dyn["Command"].str.replace("{iface}", iface)
+    dyn["parser"] = parser[dyn.index].where(dyn["Type"] == "dynamic_multi", "")
+    # {iface} / {queue} stay in the command; build_registry expands them to every NIC and queue
+    dyn["command"]   = dyn["Command"]
     dyn["min_thresh"] = pd.to_numeric(
         dyn.get("Threshold_Min", pd.Series([None] * len(dyn))),
         errors="coerce"
@@ -88,64 +89,121 @@ def load_dynamic_df():
     )
     dyn["unit"] = dyn.get("Unit", "").fillna("")
 
+    # Alert rule columns (optional): sustained duration, hysteresis band, max rate of change
+    for column, key in (("Alert_For", "alert_for"), ("Hysteresis", "hysteresis"), ("Rate_Max", "rate_max")):
+        dyn[key] = pd.to_numeric(
+            dyn.get(column, pd.Series([None] * len(dyn), index=dyn.index)),
+            errors="coerce"
+        )
+
+    # Cumulative counters: Counter = 1/0 (blank = infer from the name); Threshold_On = value | rate
+    dyn["counter"] = pd.to_numeric(
+        dyn.get("Counter", pd.Series([None] * len(dyn), index=dyn.index)),
+        errors="coerce"
+    )
+    dyn["threshold_on"] = dyn.get("Threshold_On", pd.Series([""] * len(dyn), index=dyn.index)).fillna("").astype(str).str.strip().str.lower()
+
     return dyn
 
+@st.cache_resource(ttl="10min", show_spinner=False)
+def load_metric_registry():
+    """Compiled metric specs (by name / by base command) so hot paths never scan the DataFrame."""
+    from engine.registry import build_registry
+    return build_registry(load_dynamic_df().to_dict("records"))
+
+@st.cache_resource(show_spinner=False)
+def get_sampler():
+    """One background sampler per process, shared by every session/tab."""
+    from engine.sampler import Sampler
+    return Sampler()
+
+@st.cache_resource(show_spinner=False)
+def get_history_stores():
+    """History and rollup readers shared across reruns; their partition caches only read newly written files."""
+    from engine.history import HistoryStore
+    from engine.rollup import RollupStore
+    store = HistoryStore()
+    return store, RollupStore(raw=store)  # open rollup buckets are filled from the same raw reader
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    """Content-addressed store of past system collections (see engine/snapshots.py)."""
+    from engine.snapshots import SnapshotStore
+    return SnapshotStore()
+
+@st.cache_resource(show_spinner=False)
+def get_redfish_client(bmc_ip, port=8000, use_https=False, username="ADMIN", password="ADMIN"):
+    """One pooled, session-authenticated client per BMC + credentials (see engine/redfish.py)."""
+    from engine.redfish import RedfishClient
+    return RedfishClient(bmc_ip, port, use_https, username, password)
+
 def build_system_profile(sections):
     """Clean, short hardware fingerprint"""
+    from engine.facts import extract_facts, summarize
     profile = ["**Hardware Profile (from Collect Data):**"]
+    # Structured facts (engine/facts.py) first; raw text only for what no parser covers
+    facts = extract_facts(sections)
+    if facts:
+        profile.append("\n**Parsed facts**")
+        profile.extend(f"- {line}" for line in summarize(facts))
     key_sections = ["CPU Info", "NIC Model Info", "Environmental Parameters",
                     "Memory Info", "NUMA Topology", "NIC Firmware Info"]
     for title in key_sections:
         if title in sections:
             profile.append(f"\n**{title}**")
             for subtitle, data in list(sections[title].items())[:5]:
+                if data.get("facts"):
+                    continue
                 out = data.get("output", "").strip()
                 if out:
                     clean = out.replace("\n", " ")[:280] + ("..." if len(out) > 280 else "")
                     profile.append(f"- {subtitle}: {clean}")
     return "\n".join(profile)
 
-def take_ai_snapshot(dynamic_df, monitored_metrics):
-    """Run current values for monitored metrics"""
+def take_ai_snapshot(registry, monitored_metrics):
+    """Run current values for monitored metrics (one run per distinct base command)
+
+    Kept prompt-sized: metric families (meminfo, ethtool -S, ...) are left out and {iface}/{queue}
+    templates are summarised per interface (one value, or queue sum / max / imbalance).
+    """
+    from engine.templates import aggregate
+    names = [m for m in monitored_metrics if m in registry and not registry[m].is_family]
+    if not names:
+        return {}
+    values = registry.collect(names)
     snapshot = {}
-    for subtitle in monitored_metrics:
-        row = dynamic_df[dynamic_df["Subsection_Title"] == subtitle]
-        if not row.empty:
-            # Use the pre-replaced command from load_dynamic_df 
-            cmd = row.iloc[0].get("command")
-            try:
-                output = subprocess.check_output(cmd, shell=True, text=True, stderr=subprocess.STDOUT).strip()
-                try:
-                    val = float(output) if output else 0.0
-                except ValueError:
-                    val = output[:100]
-                snapshot[subtitle] = val
-            except Exception:
-                snapshot[subtitle] = "error"
+    for subtitle in names:
+        spec = registry[subtitle]
+        val = values.get(subtitle, float("nan"))
+        if spec.has_queues:
+            per_iface = {}
+            for _, v, iface, _ in spec.readings(values):
+                per_iface.setdefault(iface, []).append(v)
+            summary = {iface: aggregate(vs) for iface, vs in per_iface.items()}
+            summary = {iface: {k: round(a, 4) for k, a in agg.items() if a == a} for iface, agg in summary.items()}
+            snapshot[subtitle] = {iface: agg for iface, agg in summary.items() if agg} or "error"
+        elif spec.is_template:
+            snapshot[subtitle] = {iface: v for _, v, iface, _ in spec.readings(values) if v == v} or "error"
+        else:
+            snapshot[subtitle] = val if val == val else "error"
     return snapshot
 
 
 def build_full_raw_text(sections):
     """Reconstruct exact format like original parse_system_info()"""
+    from engine.facts import to_json as facts_json
     text = ""
     for title, subs in sections.items():
         text += f"=== {title} ===\n"
         for subtitle, data in subs.items():
             cmd = data.get("command", "").strip()
-            out = data.get("output", "").strip() or "(no output yet)"
+            if data.get("facts"):
+                out = "facts: " + facts_json(data["facts"])  # parsed once at collection, much shorter than the text
+            else:
+                out = data.get("output", "").strip() or "(no output yet)"
             text += f"--- {subtitle} ---\n{cmd}\n{out}\n\n"
     return text.strip()
 
-def get_default_interface():
-    """Get the first non-loopback network interface."""
-    try:
-        output = subprocess.getoutput(
-            "ip link | grep -oP '^[0-9]+: \K[^:]+' | grep -v lo | head -n1"
-        ).strip()
-        return output if output else "unknown"
-    except Exception:
-        return "unknown"
-    
 def generate_selected_report(last):
     selected = [r for r in last.get("recommendations", []) if r.get("id") in st.session_state.get("selected_upgrade_recs", [])]
     if not selected:
@@ -367,38 +425,12 @@ def get_redfish_groups(attributes, return_attributes=False):
 
 def fetch_redfish_endpoint(bmc_ip, port=8000, use_https=False, username="ADMIN", password="ADMIN", endpoint="/redfish/v1/Systems/1/Bios"):
 
-    protocol = "https" if use_https else "http"
-    base_url = f"{protocol}://{bmc_ip}:{port}"
-    auth = HTTPBasicAuth(username, password) if username and password else None
+    # Keep-alive session, token auth and System / Chassis ID discovery are shared per BMC
+
+    client = get_redfish_client(bmc_ip, port, use_https, username, password)
 
     try:
-        # Discover real System ID
-
-        if "/Systems/" in endpoint or endpoint.startswith("/redfish/v1/Systems"):
-            systems_url = f"{base_url}/redfish/v1/Systems"
-            systems_resp = requests.get(systems_url, auth=auth, verify=False, timeout=8)
-            systems_resp.raise_for_status()
-            members = systems_resp.json().get("Members", [])
-            if members:
-                system_id_url = members[0]["@odata.id"]   # e.g. /redfish/v1/Systems/437XR1138R2
-                # Replace any "/Systems/1/" with the real ID
-                endpoint = endpoint.replace("/Systems/1/", f"{system_id_url}/")
-
-        # Discover real Chassis ID
-
-        if "/Chassis/" in endpoint:
-            chassis_url = f"{base_url}/redfish/v1/Chassis"
-            chassis_resp = requests.get(chassis_url, auth=auth, verify=False, timeout=8)
-            chassis_resp.raise_for_status()
-            members = chassis_resp.json().get("Members", [])
-            if members:
-                chassis_id_url = members[0]["@odata.id"]
-                endpoint = endpoint.replace("/Chassis/1/", f"{chassis_id_url}/")
-
-        full_url = f"{base_url}{endpoint}"
-        resp = requests.get(full_url, auth=auth, verify=False, timeout=8)
-        resp.raise_for_status()
-        return resp.json()
+        return client.get(endpoint)
 
     except Exception as e:
         st.error(f"Redfish endpoint {endpoint} failed: {str(e)}")
@@ -534,6 +566,8 @@ def test_redfish_connection(bmc_ip, port, use_https, username, password):
     # Connection test
 
     try:
+        # Test with a fresh login and member discovery, not what the cached client remembers
+        get_redfish_client(bmc_ip, port, use_https, username, password).reset()
         data = fetch_redfish_endpoint(
             bmc_ip=bmc_ip, port=port, use_https=use_https,
             username=username, password=password,
@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import signal
+import sys
+import time
+
+# Headless entry point for cron / systemd, no Streamlit involved:
+#   python -m engine collect [--refresh]             one-shot collection -> system_snapshots/ (prints the snapshot id)
+#   python -m engine sample --interval 10            background sampling -> monitoring_history/ until stopped
+#   python -m engine export [--snapshot ID] [-o F]   history CSV or a snapshot's report to stdout / a file
+# With --hosts FILE, collect and sample run across every host of it (engine.fleet) into fleet/<host>/...;
+# export --host NAME reads that host's stores.
+# Run from the app folder: the stores and sections_config.xlsx are the ones the UI reads.
+# Each subcommand imports only what it uses, so collect never loads pyarrow / pandas.
+
+def _log(text):
+    print(text, file=sys.stderr, flush=True)
+
+def _output(path, binary=False):
+    """The file to export into: path, or stdout (left open) when no path is given."""
+    if path:
+        return open(path, "wb") if binary else open(path, "w", newline="")
+    return contextlib.nullcontext(sys.stdout.buffer if binary else sys.stdout)
+
+def _default_iface():
+    from engine.templates import list_interfaces
+    interfaces = list_interfaces()
+    return interfaces[0] if interfaces else "unknown"
+
+# TODO: Subcommands
+
+def cmd_collect(args):
+    from engine.collector import MAX_WORKERS, OutputCache, collect, record
+    from engine.sheet import build_sections, read_rows
+    from engine.snapshots import SnapshotStore
+
+    if args.hosts:
+        return _collect_fleet(args)
+    sections = build_sections(read_rows(args.config), args.iface or _default_iface())
+    jobs = {
+        (title, subtitle): data["command"]
+        for title in sections for subtitle, data in sections[title].items()
+        if data["command"].strip()
+    }
+    policies = {key: sections[key[0]][key[1]]["cache"] for key in jobs}
+    store = SnapshotStore(args.snapshots)
+    started = time.monotonic()
+    failed = 0
+    results = collect(jobs, args.workers or MAX_WORKERS, args.timeout, store=store, cache=OutputCache(store), policies=policies,
+                      refresh=args.refresh)
+    for (title, subtitle), result in results:
+        data = record(sections[title][subtitle], result)
+        failed += data["status"] != "Success"
+        if args.verbose or data["status"] != "Success":
+            took = "cached" if result["cached"] else f"{result['elapsed']:.1f}s"
+            reason = f" ({data['reason']})" if data["reason"] and not result["cached"] else ""
+            _log(f"{data['status']:<8} {title} / {subtitle} [{took}]{reason}")
+    snapshot_id = store.save(sections)
+    _log(f"{len(jobs)} commands in {time.monotonic() - started:.1f}s, {failed} not successful")
+    print(snapshot_id)
+    return 0
+
+def _collect_fleet(args):
+    from engine.fleet import PER_HOST, collect_fleet, load_hosts
+    from engine.sheet import read_rows
+
+    hosts, rows = load_hosts(args.hosts), read_rows(args.config)
+    started = time.monotonic()
+    errors = 0
+    for host, summary, error in collect_fleet(hosts, rows, args.max_hosts, args.workers or PER_HOST, args.timeout,
+                                                  args.refresh):
+        if error is not None:
+            errors += 1
+            _log(f"{host.name}: {error}")
+            continue
+        _log(f"{host.name}: {summary['commands']} commands in {summary['elapsed']:.1f}s, {summary['failed']} not successful")
+        print(f"{host.name}\t{summary['snapshot']}")
+    _log(f"{len(hosts)} hosts in {time.monotonic() - started:.1f}s")
+    return 1 if errors else 0
+
+def cmd_sample(args):
+    from engine.registry import build_registry
+    from engine.sampler import Sampler
+    from engine.sheet import metric_records, read_rows
+
+    records = metric_records(read_rows(args.config))
+    registry = build_registry(records)
+    metrics = args.metrics or [spec.name for spec in registry]
+    unknown = [m for m in metrics if m not in registry]
+    if unknown:
+        _log(f"Unknown metrics: {', '.join(unknown)}")
+        return 2
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    if args.hosts:
+        from engine.fleet import load_hosts, start_fleet_sampling
+        samplers = start_fleet_sampling(load_hosts(args.hosts), records, args.metrics, args.interval, args.max_hosts)
+        _log(f"Sampling {len(metrics)} metrics every {args.interval:g}s on {len(samplers)} hosts")
+    else:
+        samplers = {"": Sampler(args.history_dir)}
+        samplers[""].configure(registry, metrics, args.interval)
+        samplers[""].start()
+        _log(f"Sampling {len(metrics)} metrics every {args.interval:g}s into {args.history_dir}/")
+    deadline = time.monotonic() + args.duration if args.duration else None
+    try:
+        while not stop and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.5)
+            for name, sampler in samplers.items():
+                if sampler.last_error:
+                    _log(f"{name or 'Sampling'} error: {sampler.last_error}")
+                    sampler.last_error = None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sampler in samplers.values():
+            sampler.pause()
+        for sampler in samplers.values():
+            sampler.writer.close()
+    return 0
+
+def cmd_export(args):
+    if args.host:
+        from engine.fleet import Host
+        host = Host(args.host, None)
+        args.snapshots, args.history_dir = host.snapshot_dir(), host.history_dir()
+    if args.snapshot is not None:
+        from engine.snapshots import SnapshotStore
+        store = SnapshotStore(args.snapshots)
+        snapshot_id = args.snapshot or next(iter(store.ids()), None)
+        if snapshot_id is None:
+            _log(f"No snapshots in {args.snapshots}/")
+            return 1
+        with store.export_report(snapshot_id) as report, _output(args.output, binary=True) as out:
+            for chunk in iter(lambda: report.read(1 << 16), b""):
+                out.write(chunk)
+        return 0
+
+    from engine.history import HistoryStore
+    with _output(args.output) as out:
+        count = HistoryStore(args.history_dir).write_csv(out)
+    _log(f"{count} history rows")
+    return 0
+
+# TODO: Arguments
+
+def build_parser():
+    from engine.collector import COMMAND_TIMEOUT, MAX_WORKERS
+    from engine.fleet import MAX_HOSTS, PER_HOST
+    from engine.sheet import SECTIONS_FILE
+    from engine.snapshots import SNAPSHOT_DIR
+
+    # engine.history.HISTORY_DIR, spelled out so that building the parser does not import pyarrow
+    history_dir, snapshot_dir = "monitoring_history", SNAPSHOT_DIR
+
+    parser = argparse.ArgumentParser(prog="python -m engine", description="Headless system collection and metric sampling.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    collect = sub.add_parser("collect", help="Run every sheet command once and save a snapshot")
+    collect.add_argument("--config", default=SECTIONS_FILE, help="sections workbook (default: %(default)s)")
+    collect.add_argument("--iface", help="interface for {iface} / {queue} rows (default: first physical NIC)")
+    collect.add_argument("--snapshots", default=snapshot_dir, help="snapshot store (default: %(default)s)")
+    collect.add_argument("--workers", type=int, help=f"concurrent commands (default: {MAX_WORKERS}; {PER_HOST} per host in fleet mode)")
+    collect.add_argument("--timeout", type=float, default=COMMAND_TIMEOUT, help="per-command deadline in seconds")
+    collect.add_argument("--refresh", action="store_true", help="re-run commands whose cached output is still valid")
+    collect.add_argument("--hosts", help="hosts file: collect on every host of it (fleet mode)")
+    collect.add_argument("--max-hosts", type=int, default=MAX_HOSTS, help="hosts collected at once in fleet mode")
+    collect.add_argument("-v", "--verbose", action="store_true", help="log every command, not just failures")
+    collect.set_defaults(func=cmd_collect)
+
+    sample = sub.add_parser("sample", help="Sample metrics into the history store until stopped")
+    sample.add_argument("--config", default=SECTIONS_FILE, help="sections workbook (default: %(default)s)")
+    sample.add_argument("--metrics", nargs="+", help="metric names (default: every dynamic row)")
+    sample.add_argument("--interval", type=float, default=10.0, help="seconds between samples (default: %(default)s)")
+    sample.add_argument("--duration", type=float, help="stop after this many seconds (default: until SIGTERM / Ctrl+C)")
+    sample.add_argument("--history-dir", default=history_dir, help="history store (default: %(default)s)")
+    sample.add_argument("--hosts", help="hosts file: sample every host of it into fleet/<host>/ (fleet mode)")
+    sample.add_argument("--max-hosts", type=int, default=MAX_HOSTS, help="hosts set up at once in fleet mode")
+    sample.set_defaults(func=cmd_sample)
+
+    export = sub.add_parser("export", help="Write the history as CSV, or a snapshot's report")
+    export.add_argument("--history-dir", default=history_dir, help="history store (default: %(default)s)")
+    export.add_argument("--snapshot", nargs="?", const="", help="export this snapshot's report instead (no ID: latest)")
+    export.add_argument("--snapshots", default=snapshot_dir, help="snapshot store (default: %(default)s)")
+    export.add_argument("--host", help="export a fleet host's stores (fleet/<host>/...)")
+    export.add_argument("-o", "--output", help="output file (default: stdout)")
+    export.set_defaults(func=cmd_export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, KeyError, ValueError) as e:
+        _log(f"{args.command}: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
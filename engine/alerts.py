@@ -0,0 +1,163 @@
+from datetime import datetime
+
+import numpy as np
+
+# Alert rules, declared per metric in the Sections sheet:
+#   Threshold_Min / Threshold_Max   level bounds (either optional)
+#   Alert_For                       seconds a breach must persist before the alert fires
+#   Hysteresis                      a firing level alert clears only once the value is this far back inside the bounds
+#   Rate_Max                        maximum per-second increase (counters); computed between consecutive samples
+# Every metric occupies one slot in a set of NumPy arrays, so a tick evaluates all rules in one pass.
+
+RULES = (("_lo", "min_thresh", np.nan), ("_hi", "max_thresh", np.nan), ("_hyst", "hysteresis", 0.0),
+         ("_for", "alert_for", 0.0), ("_rate_max", "rate_max", np.nan))   # rule column, spec attribute, default
+
+def _rule(spec, attr, default):
+    value = getattr(spec, attr)
+    return default if value != value else value
+
+class AlertEngine:
+    """Vectorized alert state machine (ok -> pending -> firing -> ok) with an append-only log."""
+
+    def __init__(self, log=None):
+        self.log = log
+        self._slots = {}            # metric -> index
+        self._names = []
+        self._specs = []            # the spec each slot's rule columns were read from
+        self._lo = np.empty(0)
+        self._hi = np.empty(0)
+        self._hyst = np.empty(0)
+        self._for = np.empty(0)
+        self._rate_max = np.empty(0)
+        self._prev = np.empty(0)
+        self._prev_ts = np.empty(0)
+        self._since = np.empty(0)   # epoch seconds the current breach started (NaN = not breaching)
+        self._firing = np.empty(0, dtype=bool)
+        self._fired_value = np.empty(0)
+        self._fired_reason = []
+        self._restored = self._restore()
+
+    def _restore(self):
+        """Alerts that were firing when the process last stopped (last transition per metric in the log)."""
+        restored = {}
+        if self.log is None:
+            return restored
+        for e in self.log.tail(2000):
+            if e.get("type") != "alert":
+                continue
+            if e.get("state") == "firing":
+                restored[e["metric"]] = e
+            else:
+                restored.pop(e["metric"], None)
+        return restored
+
+    def _add(self, new):
+        """Allocate slots for [(metric, spec)] not seen before (one array extension per tick)."""
+        first = len(self._names)
+        for offset, (metric, _) in enumerate(new):
+            self._slots[metric] = first + offset
+            self._names.append(metric)
+            self._specs.append(None)
+            self._fired_reason.append("")
+        nan = np.full(len(new), np.nan)
+        for column, _, _ in RULES:
+            setattr(self, column, np.concatenate([getattr(self, column), nan]))
+        self._update([(self._slots[metric], spec) for metric, spec in new])
+        self._prev = np.concatenate([self._prev, nan])
+        self._prev_ts = np.concatenate([self._prev_ts, nan])
+        self._since = np.concatenate([self._since, nan])
+        self._firing = np.concatenate([self._firing, np.zeros(len(new), dtype=bool)])
+        self._fired_value = np.concatenate([self._fired_value, nan])
+        for metric, _ in new:
+            previous = self._restored.pop(metric, None)
+            if previous is not None:
+                slot = self._slots[metric]
+                self._firing[slot] = True
+                self._fired_value[slot] = previous.get("value", np.nan)
+                self._fired_reason[slot] = previous.get("reason", "")
+                self._since[slot] = datetime.fromisoformat(previous["since"]).timestamp()
+
+    def _update(self, changed):
+        """Read the rule columns of [(slot, spec)] from their specs (new slots, or a reloaded sheet)."""
+        for slot, spec in changed:
+            self._specs[slot] = spec
+            for column, attr, default in RULES:
+                getattr(self, column)[slot] = _rule(spec, attr, default)
+
+    def evaluate(self, now, samples):
+        """samples: [(metric, value, spec)] from one tick. Returns the transition events logged."""
+        if not samples:
+            return []
+        new = {m: spec for m, _, spec in samples if m not in self._slots}
+        if new:
+            self._add(list(new.items()))
+        # Sampler.configure() with a reloaded registry hands in new specs: apply their (edited) rules
+        changed = [(self._slots[m], spec) for m, _, spec in samples if self._specs[self._slots[m]] is not spec]
+        if changed:
+            self._update(changed)
+        idx = np.fromiter((self._slots[m] for m, _, _ in samples), dtype=np.int64, count=len(samples))
+        values = np.fromiter((v for _, v, _ in samples), dtype=np.float64, count=len(samples))
+        valid = ~np.isnan(values)   # a failed read leaves the metric's alert state untouched
+        idx, values = idx[valid], values[valid]
+        t = now.timestamp()
+
+        lo, hi, hyst = self._lo[idx], self._hi[idx], self._hyst[idx]
+        lo_eff = np.where(np.isnan(lo), -np.inf, lo)
+        hi_eff = np.where(np.isnan(hi), np.inf, hi)
+        firing = self._firing[idx]
+
+        ### Level rule with hysteresis: enter outside [lo, hi], leave inside [lo + h, hi - h]
+        with np.errstate(invalid="ignore"):
+            outside = (values < lo_eff) | (values > hi_eff)
+            recovered = (values >= lo_eff + hyst) & (values <= hi_eff - hyst)
+        level = np.where(firing, ~recovered, outside)
+
+        ### Rate-of-change rule
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = (values - self._prev[idx]) / (t - self._prev_ts[idx])
+            rate_max = self._rate_max[idx]
+            too_fast = rate > rate_max              # NaN (no rule) compares False
+        # No rate yet (first sample, e.g. after a restart): a firing rate alert stays as it is
+        too_fast |= np.isnan(rate) & firing & ~np.isnan(rate_max)
+        self._prev[idx] = values
+        self._prev_ts[idx] = t
+
+        ### Sustained-duration window
+        breaching = level | too_fast
+        since = np.where(breaching, np.where(np.isnan(self._since[idx]), t, self._since[idx]), np.nan)
+        self._since[idx] = since
+        fire = breaching & ~firing & (t - since >= self._for[idx])
+        resolve = firing & ~breaching
+        self._firing[idx] = (firing | fire) & ~resolve
+
+        events = []
+        for i in np.flatnonzero(fire):
+            slot = idx[i]
+            reason = f"rate {rate[i]:.4g}/s > {self._rate_max[slot]:g}/s" if too_fast[i] else "outside thresholds"
+            self._fired_value[slot] = values[i]
+            self._fired_reason[slot] = reason
+            events.append({"time": now.isoformat(), "type": "alert", "state": "firing", "metric": self._names[slot],
+                           "value": float(values[i]), "reason": reason,
+                           "since": datetime.fromtimestamp(since[i]).isoformat()})
+        for i in np.flatnonzero(resolve):
+            slot = idx[i]
+            events.append({"time": now.isoformat(), "type": "alert", "state": "resolved", "metric": self._names[slot],
+                           "value": float(values[i]), "reason": self._fired_reason[slot]})
+        if self.log is not None:
+            self.log.append(events)
+        return events
+
+    def active(self, metrics=None):
+        """{metric: (value when fired, since datetime, reason)} for firing alerts."""
+        return {
+            self._names[i]: (self._fired_value[i], datetime.fromtimestamp(self._since[i]), self._fired_reason[i])
+            for i in np.flatnonzero(self._firing)
+            if metrics is None or self._names[i] in metrics
+        }
+
+    def pending(self, metrics=None):
+        """Metrics breaching but still inside their Alert_For window."""
+        return {
+            self._names[i] for i in np.flatnonzero(~self._firing & ~np.isnan(self._since))
+            if metrics is None or self._names[i] in metrics
+        }
@@ -0,0 +1,117 @@
+import math
+
+# Streaming anomaly detection, O(1) per sample per metric:
+#   spike          EWMA mean/variance z-score beyond Z_THRESHOLD
+#   shift up/down  two-sided CUSUM on the z-scores (slow, sustained drifts a z-score misses)
+#   counter reset  a metric that has only ever gone up drops to (near) zero
+# Metrics that behave like counters (non-decreasing for COUNTER_RUN samples) are analysed
+# as per-second rates, so a creeping drop counter is judged on how fast it grows.
+
+ALPHA = 0.05            # EWMA weight of the newest sample
+WARMUP = 30             # samples before any flag is raised
+Z_THRESHOLD = 4.0
+CUSUM_K = 0.5           # slack per sample, in standard deviations
+CUSUM_H = 8.0           # decision threshold, in standard deviations
+COUNTER_RUN = 30
+
+class _State:
+    __slots__ = ("n", "mean", "var", "pos", "neg", "prev", "prev_ts", "run", "counter")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.pos = 0.0
+        self.neg = 0.0
+        self.prev = None
+        self.prev_ts = None
+        self.run = 0
+        self.counter = False
+
+    def reset_stats(self):
+        self.n, self.mean, self.var, self.pos, self.neg = 0, 0.0, 0.0, 0.0, 0.0
+
+class AnomalyDetector:
+    """Per-metric incremental detectors; update() returns the anomalies a new sample raises."""
+
+    def __init__(self, alpha=ALPHA, warmup=WARMUP, z_threshold=Z_THRESHOLD, cusum_k=CUSUM_K, cusum_h=CUSUM_H):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self._states = {}
+
+    def clear(self):
+        self._states = {}
+
+    def forget(self, keep):
+        """Drop state for metrics no longer sampled."""
+        for metric in list(self._states):
+            if metric not in keep:
+                del self._states[metric]
+
+    def update(self, metric, ts_ns, value):
+        """Feed one sample; returns [(kind, detail)] (usually empty)."""
+        if value != value:
+            return []
+        s = self._states.get(metric)
+        if s is None:
+            s = self._states[metric] = _State()
+        found = []
+
+        ### Counter classification / reset
+        prev, prev_ts = s.prev, s.prev_ts
+        s.prev, s.prev_ts = value, ts_ns
+        if prev is None:
+            return []
+        if value < prev:
+            if s.counter and value <= prev / 2:
+                # counters restart near zero (driver reload, link reset, reboot)
+                found.append(("counter reset", f"{prev:g} → {value:g}"))
+                s.reset_stats()
+                s.run = 0
+                return found
+            if s.counter:
+                s.counter = False  # a gauge that merely rose for a while
+                s.reset_stats()
+            s.run = 0
+        else:
+            s.run += 1
+            if not s.counter and s.run >= COUNTER_RUN and value > prev:
+                s.counter = True
+                s.reset_stats()  # from now on the rate is tracked, not the level
+
+        if s.counter:
+            elapsed = (ts_ns - prev_ts) / 1e9
+            if elapsed <= 0:
+                return found
+            x = (value - prev) / elapsed
+        else:
+            x = value
+
+        ### EWMA z-score and CUSUM
+        if s.n >= self.warmup:
+            std = max(math.sqrt(s.var), 1e-9, 1e-6 * abs(s.mean))
+            z = (x - s.mean) / std
+            label = "rate" if s.counter else "value"
+            if abs(z) >= self.z_threshold:
+                found.append(("spike", f"{label} {x:.4g}, z={z:+.1f}"))
+            zc = max(-self.z_threshold, min(self.z_threshold, z))  # one spike alone is not a shift
+            s.pos = max(0.0, s.pos + zc - self.cusum_k)
+            s.neg = max(0.0, s.neg - zc - self.cusum_k)
+            if s.pos > self.cusum_h:
+                found.append(("shift up", f"{label} mean {s.mean:.4g} → {x:.4g}"))
+                s.pos = s.neg = 0.0
+            elif s.neg > self.cusum_h:
+                found.append(("shift down", f"{label} mean {s.mean:.4g} → {x:.4g}"))
+                s.pos = s.neg = 0.0
+
+        s.n += 1
+        if s.n == 1:
+            s.mean = x
+        else:
+            delta = x - s.mean
+            s.mean += self.alpha * delta
+            s.var = (1 - self.alpha) * (s.var + self.alpha * delta * delta)
+        return found
@@ -0,0 +1,210 @@
+import json
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# One-shot system collection (the Data tab's "Collect System Information"): every sheet row's command
+# runs on a bounded thread pool with its own deadline, so the total wall time is roughly the slowest
+# command and a hung one (dmidecode on a busy BMC, ping without DNS) only costs its timeout.
+# Outputs stream to disk; callers hold a bounded head/tail preview plus the byte count.
+
+MAX_WORKERS = 8
+COMMAND_TIMEOUT = 30
+HEAD_BYTES = 8192       # kept in memory per output; the rest stays in the spool / snapshot store
+TAIL_BYTES = 8192
+CHUNK = 1 << 16
+
+# Cache column of the Sections sheet: how long a successful output stays valid
+#   always (or empty)   run every time
+#   reboot              reuse until the boot ID changes (lscpu, dmidecode, lspci, ...)
+#   ttl:N               reuse for N seconds
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+CACHE_FILE = "cache.json"
+
+def parse_policy(text):
+    """("always" | "reboot" | "ttl", seconds) from a Cache cell; empty / unknown values (NaN) mean always."""
+    text = str(text or "").strip().lower()
+    if text == "reboot":
+        return "reboot", None
+    if text.startswith("ttl:"):
+        try:
+            return "ttl", float(text[4:])
+        except ValueError:
+            pass
+    return "always", None
+
+def boot_id():
+    """Identifier of the current boot (Linux boot_id, macOS kern.boottime); None if unknown."""
+    try:
+        with open(BOOT_ID_FILE) as f:
+            return f.read().strip() or None
+    except OSError:
+        pass
+    try:
+        out = subprocess.run(["sysctl", "-n", "kern.boottime"], capture_output=True, text=True, timeout=2).stdout
+        return out.strip() or None
+    except (subprocess.SubprocessError, OSError):
+        return None
+
+class OutputCache:
+    """Successful outputs per command, kept in a SnapshotStore's content store.
+
+    cache.json maps command -> {hash, boot_id, time}; the output itself is the snapshot object,
+    so a cached command costs nothing beyond what its snapshots already hold.
+    """
+
+    def __init__(self, store, boot=boot_id):
+        self.store = store
+        self.path = os.path.join(store.root, CACHE_FILE)
+        self._lock = threading.Lock()
+        self._boot_id = boot()  # the boot ID of the host the commands run on
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, command, policy):
+        """Digest of the cached output if still valid under policy, else None."""
+        kind, ttl = policy
+        entry = self._entries.get(command)
+        if kind == "always" or entry is None or not self.store.has(entry["hash"]):
+            return None
+        if kind == "reboot" and (self._boot_id is None or entry["boot_id"] != self._boot_id):
+            return None
+        if kind == "ttl" and time.time() - entry["time"] > ttl:
+            return None
+        return entry["hash"]
+
+    def put(self, command, digest):
+        with self._lock:
+            self._entries[command] = {"hash": digest, "boot_id": self._boot_id, "time": time.time()}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
+
+def preview(chunks, head=HEAD_BYTES, tail=TAIL_BYTES):
+    """(text, total bytes) of a bytes stream, keeping only its first head and last tail bytes."""
+    first, last, total = b"", b"", 0
+    for chunk in chunks:
+        total += len(chunk)
+        if len(first) < head:
+            take = head - len(first)
+            first, chunk = first + chunk[:take], chunk[take:]
+        if chunk:
+            last = (last + chunk)[-tail:]
+    text = first.decode("utf-8", "replace")
+    omitted = total - len(first) - len(last)
+    if omitted > 0:
+        text += f"\n... [{omitted:,} bytes omitted, full output on disk] ...\n"
+    return text + last.decode("utf-8", "replace"), total
+
+def run_with_deadline(command, timeout=COMMAND_TIMEOUT, store=None):
+    """Run a shell command; returns {"status", "output", "reason", "elapsed", "bytes", "hash"}.
+
+    status is "Success", "Failed" (non-zero exit) or "Timeout". The command runs in its own
+    process group so a timeout kills the whole pipeline, not just the shell. stdout is spooled
+    to a temporary file; with a SnapshotStore the full output goes into it (hash) and only a
+    head/tail preview is returned, otherwise output is the whole text.
+    """
+    start = time.monotonic()
+    with tempfile.TemporaryFile() as spool:
+        try:
+            proc = subprocess.Popen(command, shell=True, stdout=spool, stderr=subprocess.STDOUT, start_new_session=True)
+        except OSError as e:
+            return {"status": "Failed", "output": "", "reason": str(e), "elapsed": 0.0, "bytes": 0, "hash": None}
+        status, reason = "Success", ""
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            proc.wait()
+            status, reason = "Timeout", f"Timed out after {timeout:g}s"
+        if status == "Success" and proc.returncode != 0:
+            status, reason = "Failed", "Command failed or no output"
+        spool.seek(0)
+        if store is None:
+            data = spool.read()
+            output, size, digest = data.decode("utf-8", "replace"), len(data), None
+        else:
+            output, size = preview(iter(lambda: spool.read(CHUNK), b""))
+            digest = store.put_file(spool)
+    return {"status": status, "output": output, "reason": reason, "elapsed": time.monotonic() - start,
+            "bytes": size, "hash": digest}
+
+def collect(commands, max_workers=MAX_WORKERS, timeout=COMMAND_TIMEOUT, store=None, cache=None, policies=None,
+            refresh=False, run=run_with_deadline):
+    """Run {key: command} concurrently; yields (key, result) in completion order.
+
+    Outputs are spooled into store (a SnapshotStore, defaulting to the cache's) and returned as previews.
+    With an OutputCache, commands whose policy ({key: (kind, seconds)}) still holds are answered
+    from it first (result["cached"] is True); fresh successful outputs of cacheable commands are stored.
+    refresh runs everything but still updates the cache. run(command, timeout, store) executes one
+    command (run_with_deadline here; an engine.fleet transport for another host).
+    """
+    if store is None and cache is not None:
+        store = cache.store
+    policies = policies or {}
+    pending = {}
+    for key, command in commands.items():
+        policy = policies.get(key, ("always", None))
+        digest = cache.get(command, policy) if cache is not None and not refresh else None
+        if digest is None:
+            pending[key] = command
+        else:
+            output, size = preview(store.chunks(digest))
+            yield key, {"status": "Success", "output": output, "reason": "", "elapsed": 0.0,
+                        "bytes": size, "hash": digest, "cached": True}
+    if not pending:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending)), thread_name_prefix="collect") as pool:
+        futures = {pool.submit(run, command, timeout, store): key for key, command in pending.items()}
+        try:
+            for future in as_completed(futures):
+                key = futures[future]
+                result = future.result()
+                result["cached"] = False
+                if cache is not None and result["status"] == "Success" and policies.get(key, ("always",))[0] != "always":
+                    cache.put(pending[key], result["hash"])
+                yield key, result
+        finally:
+            if cache is not None:
+                cache.save()
+
+def record(data, result):
+    """Apply a collect() result to a section entry ({command, output, status, reason, ...}).
+
+    Failed commands get a readable fallback text instead of their output; timeouts keep the partial
+    output with the reason appended.
+    """
+    cmd = data["command"]
+    data["output"] = result["output"]
+    data["bytes"] = result["bytes"]
+    data["hash"] = result["hash"]
+    data["status"] = result["status"]
+    data["reason"] = "cached" if result["cached"] else result["reason"]
+    # Special case: empty sensors output
+    if data["status"] == "Success" and cmd.strip() == "sensors" and not result["output"].strip():
+        data["status"] = "Failed"
+        data["reason"] = "Command failed or no output"
+    if data["status"] == "Failed":
+        first_word = cmd.split()[0] if cmd.split() else ""
+        data["output"] = {
+            "sensors": "No sensors data available (install lm-sensors or check host if VM)\n"
+        }.get(first_word, "Command failed or no output\n")
+        data["hash"] = None
+    elif data["status"] == "Timeout":
+        data["output"] = result["output"] + f"\n{result['reason']}\n"
+    return data
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+PROC_DISKSTATS = "/proc/diskstats"
+SYS_BLOCK = "/sys/block"
+SECTOR_BYTES = 512
+MIN_INTERVAL = 0.05     # calls closer than this reuse the previous result instead of dividing by ~0
+
+# Columns of `iostat -x` (sysstat 10.x layout, which the sheet's awk rules index into)
+IOSTAT_COLUMNS = ["rrqm/s", "wrqm/s", "r/s", "w/s", "rkB/s", "wkB/s",
+                  "avgrq-sz", "avgqu-sz", "await", "r_await", "w_await", "svctm", "%util"]
+
+def read_diskstats(path=PROC_DISKSTATS):
+    """Parse /proc/diskstats into {device: (reads, rmerged, rsect, rticks, writes, wmerged, wsect, wticks, io_ticks, queue_ticks)}."""
+    stats = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 14:
+                    continue
+                c = [int(x) for x in parts[3:14]]
+                # skip field 9 (I/Os currently in flight): it is a gauge, not a counter
+                stats[parts[2]] = (c[0], c[1], c[2], c[3], c[4], c[5], c[6], c[7], c[9], c[10])
+    except (OSError, ValueError):
+        return None
+    return stats
+
+def _uptime():
+    try:
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+class DiskStatsCollector:
+    """Keeps the previous /proc/diskstats snapshot and derives iostat -x figures from deltas.
+
+    The first call reports averages since boot (like iostat's first report); later calls
+    report the interval since the previous call. Never sleeps.
+    """
+
+    def __init__(self, path=PROC_DISKSTATS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._prev = None
+        self._prev_time = None
+        self._last = None
+
+    def sample(self):
+        """Return {device: {column: value}} for every block device, or None if unavailable."""
+        with self._lock:
+            now = time.monotonic()
+            if self._last is not None and now - self._prev_time < MIN_INTERVAL:
+                return self._last
+            current = read_diskstats(self.path)
+            if current is None:
+                return None
+            if self._prev is None:
+                prev, elapsed = {}, _uptime()
+            else:
+                prev, elapsed = self._prev, now - self._prev_time
+            self._prev, self._prev_time = current, now
+            self._last = {dev: _derive(cur, prev.get(dev), elapsed) for dev, cur in current.items()}
+            return self._last
+
+def _derive(cur, prev, elapsed):
+    if prev is None or any(c < p for c, p in zip(cur, prev)):
+        prev = (0,) * len(cur)  # new device or counters reset: fall back to since-boot
+    reads, rmerged, rsect, rticks, writes, wmerged, wsect, wticks, io_ticks, queue_ticks = (
+        c - p for c, p in zip(cur, prev)
+    )
+    ios = reads + writes
+    elapsed = elapsed or 1.0
+    elapsed_ms = elapsed * 1000.0
+    return {
+        "rrqm/s": rmerged / elapsed,
+        "wrqm/s": wmerged / elapsed,
+        "r/s": reads / elapsed,
+        "w/s": writes / elapsed,
+        "rkB/s": rsect * SECTOR_BYTES / 1024 / elapsed,
+        "wkB/s": wsect * SECTOR_BYTES / 1024 / elapsed,
+        "avgrq-sz": (rsect + wsect) / ios if ios else 0.0,
+        "avgqu-sz": queue_ticks / elapsed_ms,
+        "await": (rticks + wticks) / ios if ios else 0.0,
+        "r_await": rticks / reads if reads else 0.0,
+        "w_await": wticks / writes if writes else 0.0,
+        "svctm": io_ticks / ios if ios else 0.0,
+        "%util": min(100.0, io_ticks / elapsed_ms * 100.0),
+    }
+
+_collector = DiskStatsCollector()
+
+def iostat_output(*devices):
+    """In-process replacement for `iostat -x 1 1 [dev ...]`; None means fall back to the shell command."""
+    stats = _collector.sample()
+    if stats is None:
+        return None
+    if devices:
+        names = [d for d in devices if d in stats]
+    else:
+        names = [d for d in stats if os.path.isdir(os.path.join(SYS_BLOCK, d))]  # whole disks, like iostat
+    lines = [" ".join(["Device:"] + [f"{c:>9}" for c in IOSTAT_COLUMNS])]
+    for dev in names:
+        lines.append(" ".join([f"{dev:<7}"] + [f"{stats[dev][c]:9.2f}" for c in IOSTAT_COLUMNS]))
+    return "\n".join(lines) + "\n"
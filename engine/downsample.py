@@ -0,0 +1,68 @@
+import numpy as np
+
+# Chart downsampling: a chart can't show more points than it has pixels, so series are reduced
+# to a point budget before they reach st.line_chart.
+#   minmax  keeps the first/last point plus the min and max of every bucket: a single-sample
+#           spike always survives (default for the charts)
+#   lttb    Largest-Triangle-Three-Buckets: visually closest shape for a given number of points
+
+MAX_CHART_POINTS = 1000
+
+def _buckets(n, count):
+    """Edges splitting indices 1..n-2 into count buckets (first and last points are kept as-is)."""
+    return np.linspace(1, n - 1, count + 1).astype(np.int64)
+
+def minmax(x, y, max_points=MAX_CHART_POINTS):
+    """Indices of the min and max of each bucket (in time order), plus the first and last point."""
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points or max_points < 4:
+        return np.arange(n)
+    edges = _buckets(n, (max_points - 2) // 2)
+    starts = edges[:-1]
+    valid = ~np.isnan(y)
+    lo = np.where(valid, y, np.inf)
+    hi = np.where(valid, y, -np.inf)
+
+    # Segmented argmin/argmax: compare each value with its bucket's extreme, take the first match
+    counts = np.diff(edges)
+    bucket_of = np.repeat(np.arange(len(starts)), counts)
+    def _first_match(values, extreme):
+        hits = np.flatnonzero(values[1:n - 1] == np.repeat(extreme, counts))
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        return hits[first] + 1
+    idx_lo = _first_match(lo, np.minimum.reduceat(lo[:n - 1], starts))
+    idx_hi = _first_match(hi, np.maximum.reduceat(hi[:n - 1], starts))
+
+    keep = np.concatenate(([0], idx_lo[valid[idx_lo]], idx_hi[valid[idx_hi]], [n - 1]))
+    return np.unique(keep)
+
+def lttb(x, y, max_points=MAX_CHART_POINTS):
+    """Indices chosen by Largest-Triangle-Three-Buckets (bucket averages are computed vectorized)."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    edges = _buckets(n, max_points - 2)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    avg_x = np.r_[avg_x[1:], x[-1]]     # "next bucket" average; the last bucket looks at the last point
+    avg_y = np.r_[avg_y[1:], y[-1]]
+
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(len(counts)):
+        s, e = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (avg_y[i] - y[a]))
+        a = s + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def downsample(x, y, max_points=MAX_CHART_POINTS, method="minmax"):
+    """(x, y) reduced to at most max_points points."""
+    pick = lttb if method == "lttb" else minmax
+    idx = pick(x, y, max_points)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
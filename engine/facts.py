@@ -0,0 +1,338 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from engine.metric_parsers import to_number
+
+# Structured facts from one-shot collection outputs (Data tab): lscpu, ethtool -g/-c/-k, numactl -H,
+# free, /proc/meminfo, dmidecode -t memory and lspci -v become typed dicts, parsed once per distinct
+# output (keyed by its content hash) and attached to the subsection as data["facts"].
+# Sizes are bytes, speeds MT/s / MHz, counts ints.
+
+# TODO: Helpers
+
+def _lines(output):
+    return [l.rstrip() for l in output.splitlines() if l.strip()]
+
+def _kv(line, sep=":"):
+    key, found, value = line.partition(sep)
+    return (key.strip(), value.strip()) if found else (None, None)
+
+def _int(text):
+    number = to_number(text)
+    return int(number) if number is not None else None
+
+def _size(text):
+    """Bytes from "300 MiB", "32 GB", "6158152 kB" (kB/KB/MB/GB are binary here, as in the kernel / DMI)."""
+    parts = str(text).split()
+    if not parts:
+        return None
+    unit = parts[1] if len(parts) > 1 else ""
+    unit = {"kB": "KiB", "KB": "KiB", "MB": "MiB", "GB": "GiB", "TB": "TiB"}.get(unit, unit)
+    number = to_number(parts[0] + unit)
+    return int(number) if number is not None else None
+
+# TODO: Parsers
+
+def parse_lscpu(output):
+    raw = dict(_kv(l) for l in _lines(output) if ":" in l)
+    facts = {
+        "model": raw.get("Model name", ""),
+        "architecture": raw.get("Architecture", ""),
+        "cpus": _int(raw.get("CPU(s)", "")),
+        "sockets": _int(raw.get("Socket(s)", "")),
+        "cores_per_socket": _int(raw.get("Core(s) per socket", "")),
+        "threads_per_core": _int(raw.get("Thread(s) per core", "")),
+        "numa_nodes": _int(raw.get("NUMA node(s)", "")),
+        "max_mhz": to_number(raw.get("CPU max MHz", "")),
+        "hypervisor": raw.get("Hypervisor vendor", ""),
+        "l1d_bytes": _size(raw.get("L1d cache", "")),
+        "l2_bytes": _size(raw.get("L2 cache", "")),
+        "l3_bytes": _size(raw.get("L3 cache", "")),
+        "numa_cpus": {k.split()[1][len("node"):]: v for k, v in raw.items() if re.match(r"^NUMA node\d+ CPU\(s\)$", k)},
+        "flags": raw.get("Flags", "").split(),
+    }
+    return {k: v for k, v in facts.items() if v not in (None, "", {}, [])}
+
+def parse_ethtool_ring(output):
+    """{"max": {"rx": 4096, "tx": 4096}, "current": {"rx": 1024, "tx": 1024}} (n/a fields dropped)."""
+    facts, block = {}, None
+    for line in _lines(output):
+        if line.startswith("Pre-set maximums"):
+            block = facts.setdefault("max", {})
+        elif line.startswith("Current hardware settings"):
+            block = facts.setdefault("current", {})
+        elif block is not None:
+            key, value = _kv(line)
+            number = _int(value) if key else None
+            if number is not None:
+                block[key.lower().replace(" ", "_")] = number
+    return facts
+
+def parse_ethtool_coalesce(output):
+    """{"adaptive_rx": bool, "adaptive_tx": bool, "rx-usecs": 3, ...}."""
+    facts = {}
+    for line in _lines(output):
+        m = re.match(r"^Adaptive RX:\s*(\w+)\s+TX:\s*(\w+)", line)
+        if m:
+            facts["adaptive_rx"], facts["adaptive_tx"] = m.group(1) == "on", m.group(2) == "on"
+            continue
+        key, value = _kv(line)
+        number = _int(value) if key else None
+        if number is not None:
+            facts[key] = number
+    return facts
+
+def parse_ethtool_features(output):
+    """{"on": [...], "off": [...], "fixed": [...]} of offload features."""
+    facts = {"on": [], "off": [], "fixed": []}
+    for line in _lines(output):
+        key, value = _kv(line)
+        if not key or not value or key.startswith("Features for"):
+            continue
+        state = value.split()[0]
+        if state in ("on", "off"):
+            facts[state].append(key)
+        if "[fixed]" in value:
+            facts["fixed"].append(key)
+    return facts
+
+def parse_numactl(output):
+    """{"nodes": 2, "cpus": {"0": [0, 1, ...]}, "size_bytes": {...}, "free_bytes": {...}, "distances": [[10, 21], ...]}."""
+    facts = {"cpus": {}, "size_bytes": {}, "free_bytes": {}, "distances": []}
+    in_distances = False
+    for line in _lines(output):
+        m = re.match(r"^available:\s*(\d+) nodes?", line)
+        if m:
+            facts["nodes"] = int(m.group(1))
+            continue
+        m = re.match(r"^node (\d+) (cpus|size|free):\s*(.*)$", line)
+        if m:
+            node, field, value = m.groups()
+            if field == "cpus":
+                facts["cpus"][node] = [int(c) for c in value.split()]
+            else:
+                facts[f"{field}_bytes"][node] = _size(value)
+            continue
+        if line.startswith("node distances"):
+            in_distances = True
+        elif in_distances and re.match(r"^\s*\d+:", line):
+            facts["distances"].append([int(d) for d in line.split(":", 1)[1].split()])
+    return facts
+
+def parse_free(output):
+    """{"mem": {"total": bytes, "used": ..., "available": ...}, "swap": {...}}; bare numbers are KiB (free's default)."""
+    facts = {}
+    header = _lines(output)[0].split() if _lines(output) else []
+    for line in _lines(output)[1:]:
+        parts = line.split()
+        if not parts[0].endswith(":"):
+            continue
+        row = facts[parts[0].rstrip(":").lower()] = {}
+        for name, raw in zip(header, parts[1:]):
+            number = to_number(raw)
+            if number is not None:
+                row[name.replace("/", "_")] = int(number * 1024 if raw[-1].isdigit() else number)
+    return facts
+
+def parse_meminfo(output):
+    """{"MemTotal": bytes, ..., "HugePages_Total": count, "Hugepagesize": bytes}."""
+    facts = {}
+    for line in _lines(output):
+        key, value = _kv(line)
+        if key:
+            facts[key] = _size(value) if value.endswith("kB") else _int(value)
+    return {k: v for k, v in facts.items() if v is not None}
+
+def parse_dmidecode_memory(output):
+    """{"max_capacity_bytes", "slots", "populated", "total_bytes", "dimms": [{locator, size_bytes, type, speed_mts, ...}]}."""
+    facts = {"slots": 0, "populated": 0, "total_bytes": 0, "dimms": []}
+    device = None
+    fields = {"Locator": "locator", "Bank Locator": "bank", "Type": "type", "Form Factor": "form_factor",
+              "Manufacturer": "manufacturer", "Part Number": "part_number", "Rank": "rank",
+              "Speed": "speed_mts", "Configured Memory Speed": "configured_speed_mts"}
+    for line in output.splitlines():
+        stripped = line.strip()
+        if not line.startswith(("\t", " ")):
+            device = {} if stripped == "Memory Device" else None
+            if device is not None:
+                facts["slots"] += 1
+            continue
+        key, value = _kv(stripped)
+        if key == "Maximum Capacity":
+            facts["max_capacity_bytes"] = _size(value)
+        if device is None or not key:
+            continue
+        if key == "Size":
+            size = _size(value)
+            if size:
+                device["size_bytes"] = size
+                facts["populated"] += 1
+                facts["total_bytes"] += size
+                facts["dimms"].append(device)
+        elif key in fields and value not in ("Unknown", "Not Specified", "None"):
+            device[fields[key]] = _int(value) if fields[key] in ("rank", "speed_mts", "configured_speed_mts") else value
+    return facts
+
+def parse_lspci(output):
+    """[{"slot", "class", "device", "driver", "numa_node", "link_speed", "link_width", "link_cap_speed", "link_cap_width"}]."""
+    devices, device = [], None
+    for line in output.splitlines():
+        m = re.match(r"^([0-9a-fA-F:.]+)\s+([^:]+):\s*(.*)$", line)
+        if m and not line.startswith(("\t", " ")):
+            device = {"slot": m.group(1), "class": m.group(2), "device": m.group(3)}
+            devices.append(device)
+            continue
+        if device is None:
+            continue
+        stripped = line.strip()
+        if stripped.startswith("Kernel driver in use:"):
+            device["driver"] = _kv(stripped)[1]
+        m = re.search(r"NUMA node:? (\d+)", stripped)
+        if m:
+            device["numa_node"] = int(m.group(1))
+        m = re.match(r"^(LnkSta|LnkCap):.*?Speed ([\d.]+GT/s).*?Width (x\d+)", stripped)
+        if m:
+            prefix = "link" if m.group(1) == "LnkSta" else "link_cap"
+            device[f"{prefix}_speed"], device[f"{prefix}_width"] = m.group(2), m.group(3)
+    return devices
+
+# TODO: Registry
+
+# (pattern on the normalized command, fact name (may use the pattern's groups), parser)
+FACT_PARSERS = [
+    (re.compile(r"^lscpu$"), "cpu", parse_lscpu),
+    (re.compile(r"^ethtool\s+-g\s+(\S+)$"), "ring {0}", parse_ethtool_ring),
+    (re.compile(r"^ethtool\s+-c\s+(\S+)$"), "coalesce {0}", parse_ethtool_coalesce),
+    (re.compile(r"^ethtool\s+-k\s+(\S+)$"), "offload {0}", parse_ethtool_features),
+    (re.compile(r"^numactl\s+(?:-H|--hardware)$"), "numa", parse_numactl),
+    (re.compile(r"^free(?:\s+-\w+)*$"), "free", parse_free),
+    (re.compile(r"^cat\s+/proc/meminfo$"), "meminfo", parse_meminfo),
+    (re.compile(r"^dmidecode\s+-t\s+(?:memory|17)$"), "dimms", parse_dmidecode_memory),
+    (re.compile(r"^lspci\s+-v+\b"), "pci", parse_lspci),
+]
+
+def normalize(command):
+    """Command without stderr redirects and a trailing "| cat"."""
+    command = re.sub(r"\s*2>\s*/dev/null", "", command)
+    return re.sub(r"\s*\|\s*cat\s*$", "", command).strip()
+
+def match(command):
+    """(fact name, parser) for a collection command, or (None, None)."""
+    command = normalize(command)
+    for pattern, name, parser in FACT_PARSERS:
+        m = pattern.match(command)
+        if m:
+            return name.format(*m.groups()), parser
+    return None, None
+
+class FactCache:
+    """Parsed facts per (parser, output digest); an output is parsed once however often it is collected."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, parser, digest, load):
+        key = (parser.__name__, digest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        facts = parser(load())
+        with self._lock:
+            self._entries[key] = facts
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return facts
+
+_cache = FactCache()
+
+def extract_facts(sections, load=None, cache=_cache):
+    """Attach data["facts"] to every parsable subsection; returns {fact name: facts}.
+
+    load(digest) reads a full spooled output (engine.snapshots.SnapshotStore.get); without it,
+    or for outputs not in the store, the in-session text is parsed.
+    """
+    found = {}
+    for subs in sections.values():
+        for data in subs.values():
+            name, parser = match(data.get("command", ""))
+            if parser is None or data.get("status") != "Success":
+                continue
+            digest = data.get("hash")
+            if "facts" in data:
+                facts = data["facts"]  # parsed when the section was collected
+            elif digest and load is not None:
+                facts = cache.parse(parser, digest, lambda: load(digest))
+            else:
+                text = data.get("output", "")
+                facts = cache.parse(parser, hashlib.sha256(text.encode("utf-8", "replace")).hexdigest(), lambda: text)
+            if not facts:
+                continue
+            data["facts"] = facts
+            if name == "pci" and name in found:
+                slots = {d["slot"] for d in facts}
+                facts = facts + [d for d in found[name] if d["slot"] not in slots]  # lspci -vvv wins over lspci -v -s
+            found[name] = facts
+    return found
+
+def to_json(facts):
+    """Compact JSON of a facts dict for prompts."""
+    return json.dumps(facts, separators=(",", ":"), default=str)
+
+def _gib(n):
+    return f"{n / 2 ** 30:.1f} GiB"
+
+def summarize(found):
+    """One line per fact group for the hardware fingerprint ({fact name: facts} from extract_facts)."""
+    lines = []
+    cpu = found.get("cpu")
+    if cpu:
+        topology = " × ".join(f"{cpu[k]} {label}" for k, label in
+                              (("sockets", "sockets"), ("cores_per_socket", "cores"), ("threads_per_core", "threads"))
+                              if k in cpu)
+        line = f"CPU: {cpu.get('model', '?')}, {topology} = {cpu.get('cpus', '?')} CPUs"
+        if "max_mhz" in cpu:
+            line += f", max {cpu['max_mhz']:.0f} MHz"
+        if "l3_bytes" in cpu:
+            line += f", L3 {cpu['l3_bytes'] / 2 ** 20:.0f} MiB"
+        if "hypervisor" in cpu:
+            line += f", virtualized ({cpu['hypervisor']})"
+        lines.append(line)
+    meminfo = found.get("meminfo")
+    free = found.get("free", {}).get("mem")
+    if meminfo or free:
+        total = meminfo.get("MemTotal") if meminfo else free.get("total")
+        line = f"Memory: {_gib(total)} total" if total else "Memory:"
+        if meminfo and "HugePages_Total" in meminfo:
+            line += (f", hugepages {meminfo['HugePages_Total']} × {meminfo.get('Hugepagesize', 0) // 1024} kB"
+                     f" ({meminfo.get('HugePages_Free', 0)} free)")
+        lines.append(line)
+    dimms = found.get("dimms")
+    if dimms and dimms["dimms"]:
+        kinds = sorted({f"{d.get('type', '?')} {d.get('configured_speed_mts', d.get('speed_mts', '?'))} MT/s" for d in dimms["dimms"]})
+        lines.append(f"DIMMs: {dimms['populated']}/{dimms['slots']} slots populated, {_gib(dimms['total_bytes'])}, {', '.join(kinds)}")
+    numa = found.get("numa")
+    if numa and "nodes" in numa:
+        sizes = ", ".join(f"node {n}: {len(c)} CPUs / {_gib(numa['size_bytes'].get(n) or 0)}" for n, c in numa["cpus"].items())
+        lines.append(f"NUMA: {numa['nodes']} nodes ({sizes})")
+    for name, facts in found.items():
+        kind, _, iface = name.partition(" ")
+        if kind == "ring" and "current" in facts:
+            cur, top = facts["current"], facts.get("max", {})
+            lines.append(f"Rings {iface}: rx {cur.get('rx', '?')}/{top.get('rx', '?')}, tx {cur.get('tx', '?')}/{top.get('tx', '?')}")
+        elif kind == "coalesce":
+            lines.append(f"Coalescing {iface}: adaptive rx {'on' if facts.get('adaptive_rx') else 'off'}, "
+                         f"rx-usecs {facts.get('rx-usecs', '?')}, tx-usecs {facts.get('tx-usecs', '?')}")
+        elif kind == "offload":
+            lines.append(f"Offloads {iface}: {len(facts['on'])} on, {len(facts['off'])} off")
+    nics = [d for d in found.get("pci", []) if d.get("class") == "Ethernet controller"]
+    for d in nics:
+        link = f", link {d['link_speed']} {d['link_width']}" if "link_speed" in d else ""
+        numa_node = f", NUMA node {d['numa_node']}" if "numa_node" in d else ""
+        lines.append(f"NIC {d['slot']}: {d['device']}{link}{numa_node}")
+    return lines
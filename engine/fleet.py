@@ -0,0 +1,221 @@
+import os
+import re
+import shlex
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from engine.collector import COMMAND_TIMEOUT, OutputCache, collect, record, run_with_deadline
+from engine.sheet import build_sections
+from engine.snapshots import SNAPSHOT_DIR, SnapshotStore
+
+# Fleet mode: the sections_config.xlsx collection and the metric sampler across many hosts.
+# A transport turns a command into one that runs on the host (as-is locally, through ssh remotely);
+# everything else (spooling, caching, parsing, history) stays on this machine, in per-host stores:
+#   fleet/<host>/system_snapshots/    engine.snapshots.SnapshotStore
+#   fleet/<host>/monitoring_history/  engine.history (via engine.sampler.Sampler)
+# Hosts run concurrently (MAX_HOSTS) with their own command pool each (PER_HOST), so a sweep takes
+# about as long as the slowest host.
+#
+# Hosts file, one per line ("#" comments):  [user@]host[:port] [iface]   or   local [iface]
+
+FLEET_DIR = "fleet"
+HOSTS_FILE = "fleet_hosts.txt"
+MAX_HOSTS = 16
+PER_HOST = 4
+SSH_OPTIONS = (
+    "-o", "BatchMode=yes",
+    "-o", "ConnectTimeout=5",
+    # One TCP/SSH handshake per host, reused by every command and sampler tick
+    "-o", "ControlMaster=auto",
+    "-o", "ControlPath=~/.ssh/cm-%r@%h:%p",
+    "-o", "ControlPersist=60",
+)
+
+# /sys/class/net of the host in one round trip: "<iface> <1 if physical> rx-0 rx-1 tx-0 ..."
+NET_LAYOUT_COMMAND = (
+    "cd /sys/class/net 2>/dev/null && for i in *; do [ \"$i\" = lo ] && continue; "
+    "[ -e \"$i/device\" ] && p=1 || p=0; echo \"$i\" $p $(ls \"$i/queues\" 2>/dev/null); done"
+)
+BOOT_ID_COMMAND = "cat /proc/sys/kernel/random/boot_id 2>/dev/null || sysctl -n kern.boottime"
+
+# TODO: Transports
+
+class LocalTransport:
+    """Runs commands on this machine (what the app does without fleet mode; also used for tests)."""
+
+    remote = False
+
+    def wrap(self, command):
+        return command
+
+    def run(self, command, timeout=COMMAND_TIMEOUT, store=None):
+        """Same contract as engine.collector.run_with_deadline (the collect() run hook)."""
+        return run_with_deadline(self.wrap(command), timeout, store)
+
+    def output(self, command, timeout=10):
+        result = self.run(command, timeout)
+        return result["output"] if result["status"] == "Success" else ""
+
+    def boot_id(self):
+        return self.output(BOOT_ID_COMMAND).strip() or None
+
+    def net_layout(self):
+        """(interfaces, queues) for engine.templates.expand: physical NICs first, queues(iface, kind) -> [n]."""
+        nics, queues = [], {}
+        for line in self.output(NET_LAYOUT_COMMAND).splitlines():
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            nics.append((fields[1] != "1", fields[0]))
+            for entry in fields[2:]:
+                kind, _, n = entry.partition("-")
+                if n.isdigit():
+                    queues.setdefault((fields[0], kind), []).append(int(n))
+        physical = sorted(name for virtual, name in nics if not virtual)
+        return physical or sorted(name for _, name in nics), lambda iface, kind: sorted(queues.get((iface, kind), []))
+
+    def run_batch(self, commands, timeout=10):
+        """{command: output} of several commands run in one shell (one round trip for a remote host).
+
+        Outputs are split on a random marker line; a command that fails contributes its partial output.
+        """
+        marker = f"__fleet_{uuid.uuid4().hex}__"
+        script = "\n".join(f"echo '{marker} {i}'\n( {command}\n) 2>/dev/null" for i, command in enumerate(commands))
+        result = self.run(f"sh -c {shlex.quote(script)}", timeout)
+        outputs, current, lines = {}, None, []
+        for line in result["output"].splitlines() + [f"{marker} {len(commands)}"]:
+            if line.startswith(marker):
+                if current is not None:
+                    outputs[commands[current]] = "\n".join(lines) + ("\n" if lines else "")
+                index = line[len(marker):].strip()
+                current, lines = (int(index) if index.isdigit() and int(index) < len(commands) else None), []
+            elif current is not None:
+                lines.append(line)
+        return outputs
+
+class SSHTransport(LocalTransport):
+    """Runs commands on another host through the ssh client (key-based auth, no prompts)."""
+
+    remote = True
+
+    def __init__(self, host, user=None, port=None, options=SSH_OPTIONS):
+        self.host = host
+        self.user = user
+        self.port = port
+        self.options = tuple(options)
+
+    def wrap(self, command):
+        target = f"{self.user}@{self.host}" if self.user else self.host
+        args = ["ssh", *self.options] + (["-p", str(self.port)] if self.port else []) + [target, "--", command]
+        return " ".join(shlex.quote(a) for a in args)
+
+# TODO: Hosts
+
+class Host:
+    """One fleet member: a name (its store folder), a transport and the interface for {iface} rows."""
+
+    __slots__ = ("name", "transport", "iface")
+
+    def __init__(self, name, transport, iface=None):
+        self.name = name
+        self.transport = transport
+        self.iface = iface
+
+    def __repr__(self):
+        return f"Host({self.name!r})"
+
+    def directory(self, root=FLEET_DIR):
+        return os.path.join(root, re.sub(r"[^\w.@-]", "_", self.name))
+
+    def snapshot_dir(self, root=FLEET_DIR):
+        return os.path.join(self.directory(root), SNAPSHOT_DIR)
+
+    def history_dir(self, root=FLEET_DIR):
+        # engine.history.HISTORY_DIR (not imported: collecting should not need pyarrow)
+        return os.path.join(self.directory(root), "monitoring_history")
+
+def parse_hosts(lines):
+    """[Host] from hosts-file lines: "[user@]host[:port] [iface]" or "local [iface]"."""
+    hosts = []
+    for line in lines:
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        target, iface = fields[0], (fields[1] if len(fields) > 1 else None)
+        if target in ("local", "localhost"):
+            hosts.append(Host("localhost", LocalTransport(), iface))
+            continue
+        user, _, address = target.rpartition("@")
+        address, _, port = address.partition(":")
+        hosts.append(Host(target, SSHTransport(address, user or None, int(port) if port.isdigit() else None), iface))
+    return hosts
+
+def load_hosts(path=HOSTS_FILE):
+    with open(path) as f:
+        return parse_hosts(f)
+
+# TODO: Collection
+
+def collect_host(host, rows, per_host=PER_HOST, timeout=COMMAND_TIMEOUT, refresh=False, root=FLEET_DIR, on_result=None):
+    """Run the sheet rows on one host into its snapshot store.
+
+    Returns {"snapshot", "commands", "failed", "elapsed"}; on_result(key, data) sees each finished command.
+    """
+    started = time.monotonic()
+    interfaces, queues = host.transport.net_layout()
+    iface = host.iface or (interfaces[0] if interfaces else "unknown")
+    sections = build_sections(rows, iface, queues)
+    jobs = {
+        (title, subtitle): data["command"]
+        for title in sections for subtitle, data in sections[title].items()
+        if data["command"].strip()
+    }
+    policies = {key: sections[key[0]][key[1]]["cache"] for key in jobs}
+    store = SnapshotStore(host.snapshot_dir(root))
+    cache = OutputCache(store, boot=host.transport.boot_id)
+    failed = 0
+    for key, result in collect(jobs, per_host, timeout, store=store, cache=cache, policies=policies, refresh=refresh,
+                               run=host.transport.run):
+        data = record(sections[key[0]][key[1]], result)
+        failed += data["status"] != "Success"
+        if on_result:
+            on_result(key, data)
+    return {"snapshot": store.save(sections), "commands": len(jobs), "failed": failed,
+            "elapsed": time.monotonic() - started}
+
+def collect_fleet(hosts, rows, max_hosts=MAX_HOSTS, per_host=PER_HOST, timeout=COMMAND_TIMEOUT, refresh=False,
+                  root=FLEET_DIR):
+    """collect_host() on every host concurrently; yields (host, summary or None, error or None) as hosts finish."""
+    if not hosts:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_hosts, len(hosts)), thread_name_prefix="fleet") as pool:
+        futures = {pool.submit(collect_host, host, rows, per_host, timeout, refresh, root): host for host in hosts}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+# TODO: Sampling
+
+def start_fleet_sampling(hosts, records, metrics=None, interval=10.0, max_hosts=MAX_HOSTS, root=FLEET_DIR):
+    """One running Sampler per host ({name: Sampler}) writing to the host's history store.
+
+    Templates expand over each host's own interfaces and queues; remote hosts run every tick's base
+    commands in a single ssh call. metrics defaults to every metric of the host's registry.
+    """
+    from engine.registry import build_registry
+    from engine.sampler import Sampler
+
+    def _start(host):
+        interfaces, queues = host.transport.net_layout()
+        registry = build_registry(records, interfaces, queues)
+        batch_runner = host.transport.run_batch if host.transport.remote else None
+        sampler = Sampler(host.history_dir(root), batch_runner=batch_runner)
+        sampler.configure(registry, metrics or [spec.name for spec in registry], interval)
+        sampler.start()
+        return sampler
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_hosts, len(hosts))), thread_name_prefix="fleet") as pool:
+        return dict(zip((host.name for host in hosts), pool.map(_start, hosts)))
@@ -0,0 +1,429 @@
+import atexit
+import csv
+import glob
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+HISTORY_FIELDS = ["timestamp", "metric", "value", "unit"]
+HISTORY_DIR = "monitoring_history"
+INDEX_FILE = "index.json"
+EVENTS_FILE = "events.jsonl"
+ALERTS_FILE = "alerts.jsonl"
+COMPACTED_KEY = b"compacted"    # Parquet metadata of a compact-* file: JSON list of the file names it merged
+
+# Rows handed to the writer: {"time": datetime, "timestamp": iso str, "metric", "value": float (NaN = missing), "unit"}
+
+class CsvSink:
+    """Append-only CSV file kept open between batches."""
+
+    def __init__(self, path, fieldnames=HISTORY_FIELDS):
+        self.path = path
+        self.fieldnames = fieldnames
+        self._file = None
+        self._writer = None
+
+    def _open(self):
+        new_file = not os.path.isfile(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore")
+        if new_file:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        if self._file is None or self._file.closed:
+            self._open()
+        self._writer.writerows({**r, "value": "" if r["value"] != r["value"] else r["value"]} for r in rows)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+class ParquetSink:
+    """Hour-partitioned Parquet files: <root>/date=YYYY-MM-DD/hour=HH/part-*.parquet.
+
+    Metric and unit columns are dictionary-encoded. Each batch becomes one part file; when
+    the hour rolls over, the previous hour's parts are compacted into a single file.
+    A small index.json keeps per-metric unit / first / last / count for instant lookups.
+    """
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._current = None    # (date, hour) of the partition being appended to
+        os.makedirs(root, exist_ok=True)
+        self._index = read_index(root)
+        # Parts left over from a previous run (e.g. process restarted mid-hour)
+        for directory in glob.glob(os.path.join(root, "date=*", "hour=*")):
+            compact_partition(directory)
+
+    def _partition_dir(self, date, hour):
+        return os.path.join(self.root, f"date={date}", f"hour={hour:02d}")
+
+    def write(self, rows):
+        parts = {}
+        for r in rows:
+            t = r["time"]
+            parts.setdefault((t.date().isoformat(), t.hour), []).append(r)
+
+        for (date, hour), part in sorted(parts.items()):
+            if self._current and self._current != (date, hour):
+                compact_partition(self._partition_dir(*self._current))
+            self._current = (date, hour)
+            table = pa.table({
+                "timestamp": pa.array([r["time"] for r in part], pa.timestamp("us")),
+                "metric": pa.array([r["metric"] for r in part], pa.string()).dictionary_encode(),
+                "value": pa.array([r["value"] for r in part], pa.float64(), from_pandas=True),
+                "unit": pa.array([r["unit"] or "" for r in part], pa.string()).dictionary_encode(),
+            })
+            directory = self._partition_dir(date, hour)
+            os.makedirs(directory, exist_ok=True)
+            write_parquet(table, os.path.join(directory, f"part-{time.time_ns()}.parquet"))
+
+        for r in rows:
+            stamp = r["time"].isoformat()
+            entry = self._index.setdefault(r["metric"], {"unit": r["unit"] or "", "first": stamp, "last": stamp, "count": 0})
+            entry["first"] = min(entry["first"], stamp)
+            entry["last"] = max(entry["last"], stamp)
+            entry["count"] += 1
+        write_index(self.root, self._index)
+
+    def close(self):
+        pass
+
+def read_index(root):
+    try:
+        with open(os.path.join(root, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_index(root, index):
+    path = os.path.join(root, INDEX_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(path + ".tmp", path)
+
+def write_parquet(table, path):
+    """Write via a temporary name so readers never see a half-written file."""
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def partition_files(directory):
+    """A partition's Parquet file names as (live, merged).
+
+    merged are files a compact-* file already contains: compaction writes the merged file before it
+    deletes its inputs, so readers skip them instead of seeing those rows twice.
+    """
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".parquet"))
+    except OSError:
+        return [], []
+    merged = set()
+    if len(names) > 1:
+        for name in names:
+            if name.startswith("compact-"):
+                try:
+                    metadata = pq.read_schema(os.path.join(directory, name)).metadata or {}
+                except FileNotFoundError:
+                    continue    # merged into a newer compact file meanwhile
+                merged.update(json.loads(metadata.get(COMPACTED_KEY, b"[]")))
+    return [n for n in names if n not in merged], [n for n in names if n in merged]
+
+def compact_partition(directory):
+    """Merge a partition's part and compact files into one file (keeps directory listings and scans small)."""
+    live, merged = partition_files(directory)
+    for name in merged:     # left behind by an interrupted compaction
+        os.remove(os.path.join(directory, name))
+    if len(live) < 2:
+        return
+    files = [os.path.join(directory, name) for name in live]
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    table = ds.dataset(files, format="parquet", schema=schema).to_table().sort_by("timestamp")
+    table = table.replace_schema_metadata({COMPACTED_KEY: json.dumps(live)})
+    write_parquet(table, os.path.join(directory, f"compact-{time.time_ns()}.parquet"))
+    for f in files:
+        os.remove(f)
+
+def partition_dirs(root, start=None, end=None, hourly=True):
+    """Partition directories under root overlapping [start, end], oldest first."""
+    first = start.date().isoformat() if start else None
+    last = end.date().isoformat() if end else None
+    dirs = []
+    for date_dir in sorted(glob.glob(os.path.join(root, "date=*"))):
+        date = os.path.basename(date_dir)[len("date="):]
+        if (first and date < first) or (last and date > last):
+            continue
+        for hour_dir in sorted(glob.glob(os.path.join(date_dir, "hour=*"))):
+            if hourly:
+                hour = int(os.path.basename(hour_dir)[len("hour="):])
+                if (date == first and hour < start.hour) or (date == last and hour > end.hour):
+                    continue
+            dirs.append(hour_dir)
+    return dirs
+
+class PartitionCache:
+    """Parsed partitions kept in memory between reruns.
+
+    Each partition remembers the (inode, size, mtime) of the live files it was built from (see
+    partition_files). Files are only ever added by the writers, so a refresh reads just the new part
+    files and appends them; anything else (compaction, deletion) re-reads that one partition.
+    """
+
+    def __init__(self, max_partitions=48):
+        self.max_partitions = max_partitions
+        self._lock = threading.Lock()
+        self._parts = OrderedDict()     # directory -> (files {name: stat key}, pyarrow Table)
+
+    def load(self, directory):
+        # Compaction on the writer thread may delete part files between listing and reading them:
+        # list the partition again (it now holds the compacted file) and retry once
+        try:
+            return self._load(directory)
+        except FileNotFoundError:
+            return self._load(directory)
+
+    def _load(self, directory):
+        files = {}
+        for name in partition_files(directory)[0]:
+            st = os.stat(os.path.join(directory, name))
+            files[name] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._parts.get(directory)
+        if cached and cached[0] == files:
+            table = cached[1]
+        elif cached and all(files.get(name) == key for name, key in cached[0].items()):
+            new = [name for name in sorted(files) if name not in cached[0]]
+            table = pa.concat_tables([cached[1]] + [pq.read_table(os.path.join(directory, n)) for n in new], promote_options="default")
+        else:
+            tables = [pq.read_table(os.path.join(directory, n)) for n in sorted(files)]
+            table = pa.concat_tables(tables, promote_options="default") if tables else None
+        with self._lock:
+            self._parts[directory] = (files, table)
+            self._parts.move_to_end(directory)
+            while len(self._parts) > self.max_partitions:
+                self._parts.popitem(last=False)
+        return table
+
+    def read(self, directories, predicate=None, columns=None):
+        tables = [t for t in (self.load(d) for d in directories) if t is not None and len(t)]
+        if not tables:
+            return None
+        table = pa.concat_tables(tables, promote_options="default")
+        if predicate is not None:
+            table = table.filter(predicate)
+        # Files written before a column existed simply lack it
+        return table.select([c for c in columns if c in table.column_names]) if columns else table
+
+class HistoryStore:
+    """Read side of the Parquet history: metric + time-range queries over cached partitions."""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self.cache = PartitionCache()
+
+    def index(self):
+        return read_index(self.root)
+
+    def metrics(self):
+        return sorted(self.index())
+
+    def is_empty(self):
+        return not self.index()
+
+    def _dataset(self):
+        files = [os.path.join(d, name) for d in partition_dirs(self.root) for name in partition_files(d)[0]]
+        return ds.dataset(files, format="parquet", exclude_invalid_files=True)
+
+    def query(self, metric=None, start=None, end=None, columns=("timestamp", "value")):
+        """Rows for one metric within [start, end] as a pyarrow Table.
+
+        Hour partitions outside the range are never opened; the ones inside come from the
+        partition cache, so repeated queries only read part files written since the last call.
+        """
+        empty = pa.table({c: pa.array([], pa.float64()) for c in columns})
+        if self.is_empty():
+            return empty
+        predicate = None
+        def _and(expr):
+            return expr if predicate is None else predicate & expr
+        if metric is not None:
+            predicate = _and(ds.field("metric") == metric)
+        if start is not None:
+            predicate = _and(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+        if end is not None:
+            predicate = _and(ds.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+        table = self.cache.read(partition_dirs(self.root, start, end), predicate, columns)
+        return empty if table is None else table.sort_by("timestamp")
+
+    def write_csv(self, f):
+        """Stream the full history to a text file object in monitoring_history.csv format; returns the row count."""
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_FIELDS)
+        count = 0
+        if not self.is_empty():
+            for batch in self._dataset().to_batches(columns=HISTORY_FIELDS):
+                for ts, metric, value, unit in zip(*(batch.column(c).to_pylist() for c in HISTORY_FIELDS)):
+                    writer.writerow([ts.isoformat(), metric, "" if value is None or value != value else value, unit])
+                count += batch.num_rows
+        return count
+
+    def export_csv(self):
+        """Full history as monitoring_history.csv-formatted bytes."""
+        out = io.StringIO()
+        self.write_csv(out)
+        return out.getvalue().encode()
+
+    def import_csv(self, path, batch_size=50000):
+        """Load a legacy monitoring_history.csv into the store (and its rollups). Returns the number of rows imported."""
+        from engine.rollup import RollupSink
+        sinks = [ParquetSink(self.root), RollupSink(self.root)]
+        count, rows = 0, []
+        with open(path, newline="") as f:
+            for r in csv.DictReader(f):
+                try:
+                    t = datetime.fromisoformat(r["timestamp"])
+                except (TypeError, ValueError):
+                    continue
+                value = float(r["value"]) if r.get("value") not in (None, "") else float("nan")
+                rows.append({"time": t, "timestamp": r["timestamp"], "metric": r["metric"], "value": value, "unit": r.get("unit") or ""})
+                if len(rows) >= batch_size:
+                    for sink in sinks:
+                        sink.write(rows)
+                    count, rows = count + len(rows), []
+        if rows:
+            for sink in sinks:
+                sink.write(rows)
+            count += len(rows)
+        for sink in sinks:
+            sink.close()
+        for directory in glob.glob(os.path.join(self.root, "date=*", "hour=*")):
+            compact_partition(directory)
+        return count
+
+class EventLog:
+    """Append-only JSON-lines log of discrete events (anomalies, alerts) kept beside the history."""
+
+    def __init__(self, path=os.path.join(HISTORY_DIR, EVENTS_FILE)):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, events):
+        if not events:
+            return
+        lines = "".join(json.dumps(e, default=str) + "\n" for e in events)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+    def tail(self, n=50, chunk=65536):
+        """Last n events, oldest first (reads backwards from the end of the file)."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                pos, data = f.tell(), b""
+                while pos > 0 and data.count(b"\n") <= n:
+                    step = min(chunk, pos)
+                    pos -= step
+                    f.seek(pos)
+                    data = f.read(step) + data
+        except OSError:
+            return []
+        events = []
+        for line in data.splitlines()[-n:]:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+class HistoryWriter:
+    """Buffers history rows in memory and hands them to sinks in batches on a writer thread.
+
+    A batch is flushed when batch_size rows are pending, every flush_interval seconds,
+    on flush() and at interpreter exit, so sampling never waits on file I/O.
+    """
+
+    def __init__(self, sinks, batch_size=500, flush_interval=5.0):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error = None
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flush_requested = False
+        self._writing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, rows):
+        with self._cond:
+            self._pending.extend(rows)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self, timeout=10.0):
+        """Block until everything written so far has reached the sink."""
+        with self._cond:
+            if not self._pending and not self._writing:
+                return
+            self._flush_requested = True
+            self._cond.notify()
+            self._cond.wait_for(lambda: (not self._pending and not self._writing) or self._closed, timeout)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10.0)
+        for sink in list(self.sinks):
+            sink.close()
+
+    def add_sink(self, sink):
+        with self._cond:
+            self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        with self._cond:
+            if sink in self.sinks:
+                self.sinks.remove(sink)
+        sink.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._pending) >= self.batch_size,
+                    self.flush_interval
+                )
+                batch, self._pending = self._pending, []
+                self._flush_requested = False
+                self._writing = bool(batch)
+                closed = self._closed
+                sinks = list(self.sinks)
+            if batch:
+                self.last_error = None
+                for sink in sinks:
+                    try:
+                        sink.write(batch)
+                    except Exception as e:
+                        self.last_error = f"{type(sink).__name__}: {e}"
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+            if closed:
+                return
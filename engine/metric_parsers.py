@@ -0,0 +1,98 @@
+import re
+
+# Parsers for `dynamic_multi` rows: one command output -> {metric_key: float}.
+# Declared in the sheet's Parser column as:
+#   kv                  "key: value" / "key = value" lines (ethtool -S/-c/-g/-k, /proc/meminfo)
+#   table[:<prefix>]    column table; header is the first line (or the first line starting with prefix)
+#   regex:<pattern>     named groups become metrics; a group named "key" labels each match
+
+_LEADING_NUMBER = re.compile(r"^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_SCALE = {"K": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "P": 1e15,
+          "Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40, "Pi": 2 ** 50}
+_TRUE = {"on", "yes", "true", "enabled"}
+_FALSE = {"off", "no", "false", "disabled"}
+
+def to_number(text):
+    """Leading number of a value ("123 kB", "15Gi", "1.5%", "on [fixed]"), or None if not numeric."""
+    text = str(text).strip()
+    if not text:
+        return None
+    token = text.split()[0]
+    if token.lower() in _TRUE:
+        return 1.0
+    if token.lower() in _FALSE:
+        return 0.0
+    m = _LEADING_NUMBER.match(token)
+    if not m:
+        return None
+    rest = token[m.end():]
+    if rest.endswith("B") and rest[:-1] in _SCALE:
+        rest = rest[:-1]
+    return float(m.group()) * _SCALE.get(rest, 1)
+
+def parse_kv(output):
+    values = {}
+    for line in output.splitlines():
+        m = re.match(r"^\s*([^:=]+?)\s*[:=]\s*(.*)$", line)
+        if not m:
+            continue
+        number = to_number(m.group(2))
+        if number is not None:
+            values[m.group(1)] = number
+    return values
+
+def parse_table(output, header=None):
+    lines = [l for l in output.splitlines() if l.strip()]
+    start = 0
+    if header:
+        start = next((i for i, l in enumerate(lines) if l.lstrip().startswith(header)), None)
+        if start is None:
+            return {}
+    if start >= len(lines):
+        return {}
+
+    columns = lines[start].split()
+    values = {}
+    for line in lines[start + 1:]:
+        if header and line.lstrip().startswith(header):
+            continue  # repeated header (e.g. multi-report iostat)
+        parts = line.split()
+        key = parts[0]
+        # "Mem:  15Gi ..." rows carry a label the header has no column for (free, vmstat-style)
+        names = columns if key.endswith(":") or len(parts) > len(columns) else columns[1:]
+        for name, raw in zip(names, parts[1:]):
+            number = to_number(raw)
+            if number is not None:
+                values[f"{key.rstrip(':')} {name}"] = number
+    return values
+
+def parse_regex(output, regex):
+    values = {}
+    for m in regex.finditer(output):
+        groups = m.groupdict()
+        label = groups.pop("key", None)
+        for name, raw in groups.items():
+            number = to_number(raw) if raw is not None else None
+            if number is not None:
+                values[f"{label} {name}" if label else name] = number
+    return values
+
+def compile_parser(spec):
+    """Turn a Parser cell into a callable(output) -> {key: float}. None for empty/unknown specs."""
+    spec = str(spec or "").strip()
+    if not spec or spec.lower() == "nan":
+        return None
+    kind, _, arg = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "kv":
+        return parse_kv
+    if kind == "table":
+        header = arg.strip() or None
+        return lambda output: parse_table(output, header)
+    if kind == "regex" and arg:
+        try:
+            regex = re.compile(arg, re.MULTILINE)
+        except re.error:
+            return None
+        return lambda output: parse_regex(output, regex)
+    return None
@@ -0,0 +1,321 @@
+import re
+import shlex
+import subprocess
+
+from engine.diskstats import iostat_output
+from engine.metric_parsers import compile_parser
+from engine.nicstats import ethtool_stats_output
+
+COMMAND_TIMEOUT = 10
+
+# Base commands served in-process instead of forking: (pattern, reader(*groups) -> output or None)
+NATIVE_READERS = [
+    (re.compile(r"^ethtool\s+(?:-S|--statistics)\s+([\w.:@-]+)$"), ethtool_stats_output),
+    (re.compile(r"^iostat\s+-x\s+1\s+1((?:\s+[\w-]+)*)$"), lambda devices: iostat_output(*devices.split())),
+    (re.compile(r"^cat\s+(/(?:proc|sys)/[\w./-]+)$"), lambda path: read_text(path)),
+]
+
+# TODO: Pipeline splitting
+
+def split_pipeline(command):
+    """Split a shell command on top-level pipes. Returns None if it is not a plain pipeline."""
+    segments, buf = [], []
+    quote, depth, i = None, 0, 0
+
+    while i < len(command):
+        ch = command[i]
+        if quote:
+            if ch == quote:
+                quote = None
+            elif ch == "\\" and quote == '"' and i + 1 < len(command):
+                buf.append(ch)
+                i += 1
+                ch = command[i]
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "\\" and i + 1 < len(command):
+            buf.append(ch)
+            i += 1
+            ch = command[i]
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and ch in ";&":
+            return None  # lists (&&, ;, &) are not simple pipelines
+        elif depth == 0 and ch == "|":
+            if command[i + 1:i + 2] == "|":
+                return None
+            segments.append("".join(buf).strip())
+            buf = []
+            i += 1
+            continue
+        buf.append(ch)
+        i += 1
+
+    if quote or depth:
+        return None
+    segments.append("".join(buf).strip())
+    return segments if all(segments) else None
+
+# TODO: Filter stages (grep / awk / cut / head / tail)
+
+def _bre_to_python(pattern):
+    # In basic regex, + ? | ( ) { } are literal unless escaped
+    out, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            out.append(nxt if nxt in "+?|(){}" else ch + nxt)
+            i += 2
+            continue
+        out.append("\\" + ch if ch in "+?|(){}" else ch)
+        i += 1
+    return "".join(out)
+
+def _compile_grep(args):
+    flags, patterns = set(), []
+    for arg in args:
+        if arg.startswith("-") and len(arg) > 1 and not patterns:
+            flags.update(arg[1:])
+        else:
+            patterns.append(arg)
+    if len(patterns) != 1 or not flags <= set("wivEF"):
+        return None
+
+    pattern = patterns[0]
+    if "F" in flags:
+        pattern = re.escape(pattern)
+    elif "E" not in flags:
+        pattern = _bre_to_python(pattern)
+    if "w" in flags:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+    try:
+        regex = re.compile(pattern, re.IGNORECASE if "i" in flags else 0)
+    except re.error:
+        return None
+
+    invert = "v" in flags
+    return lambda lines: [l for l in lines if bool(regex.search(l)) != invert]
+
+_AWK_PROGRAM = re.compile(
+    r'^\s*(?:/(?P<regex>(?:[^/\\]|\\.)*)/|\$(?P<col>\d+)\s*==\s*"(?P<eq>[^"]*)")?\s*'
+    r'\{\s*print\s+\$(?P<field>\d+)\s*(?P<exit>;\s*exit\s*)?;?\s*\}\s*$'
+)
+
+def _split_fields(line, sep):
+    if sep is None or sep == " ":
+        return line.split()
+    if len(sep) == 1:
+        return line.split(sep)
+    return re.split(sep, line)
+
+def _compile_awk(args):
+    sep, programs = None, []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-F" and i + 1 < len(args):
+            sep = args[i + 1]
+            i += 2
+            continue
+        if arg.startswith("-F") and len(arg) > 2:
+            sep = arg[2:]
+        else:
+            programs.append(arg)
+        i += 1
+    if len(programs) != 1:
+        return None
+    m = _AWK_PROGRAM.match(programs[0])
+    if not m:
+        return None
+
+    try:
+        regex = re.compile(m.group("regex")) if m.group("regex") is not None else None
+    except re.error:
+        return None
+    col = int(m.group("col")) if m.group("col") else None
+    eq = m.group("eq")
+    field = int(m.group("field"))
+    stop_after_first = bool(m.group("exit"))
+
+    def stage(lines):
+        out = []
+        for line in lines:
+            fields = _split_fields(line, sep)
+            if regex is not None and not regex.search(line):
+                continue
+            if col is not None:
+                actual = line if col == 0 else (fields[col - 1] if col <= len(fields) else "")
+                if actual != eq:
+                    continue
+            if field == 0:
+                out.append(line)
+            else:
+                out.append(fields[field - 1] if field <= len(fields) else "")
+            if stop_after_first:
+                break
+        return out
+
+    return stage
+
+def _compile_cut(args):
+    delim, field = "\t", None
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("-d", "-f") and i + 1 < len(args):
+            value = args[i + 1]
+            i += 2
+        elif arg[:2] in ("-d", "-f") and len(arg) > 2:
+            value = arg[2:]
+            i += 1
+        else:
+            return None
+        if arg.startswith("-d"):
+            delim = value
+        elif value.isdigit():
+            field = int(value)
+        else:
+            return None
+    if field is None or len(delim) != 1:
+        return None
+
+    def stage(lines):
+        out = []
+        for line in lines:
+            if delim not in line:
+                out.append(line)
+                continue
+            parts = line.split(delim)
+            out.append(parts[field - 1] if field <= len(parts) else "")
+        return out
+
+    return stage
+
+def _compile_head_tail(name, args):
+    count = 10
+    if len(args) == 2 and args[0] == "-n" and args[1].isdigit():
+        count = int(args[1])
+    elif len(args) == 1 and args[0].startswith("-n") and args[0][2:].isdigit():
+        count = int(args[0][2:])
+    elif len(args) == 1 and args[0][1:].isdigit() and args[0].startswith("-"):
+        count = int(args[0][1:])
+    elif args:
+        return None
+    if name == "head":
+        return lambda lines: lines[:count]
+    return lambda lines: lines[-count:] if count else []
+
+def compile_filters(segments):
+    """Compile pipeline stages after the base command into Python callables, or None if unsupported."""
+    stages = []
+    for segment in segments:
+        try:
+            argv = shlex.split(segment)
+        except ValueError:
+            return None
+        if not argv:
+            return None
+        name, args = argv[0], argv[1:]
+        if name == "grep":
+            stage = _compile_grep(args)
+        elif name == "awk":
+            stage = _compile_awk(args)
+        elif name == "cut":
+            stage = _compile_cut(args)
+        elif name in ("head", "tail"):
+            stage = _compile_head_tail(name, args)
+        else:
+            stage = None
+        if stage is None:
+            return None
+        stages.append(stage)
+    return stages
+
+# TODO: Plan building and execution
+
+def build_collection_plan(commands, parsers=None):
+    """Group metric commands by base command.
+
+    commands: {metric_name: shell_command}
+    parsers: {metric_name: Parser spec} for dynamic_multi families (see engine.metric_parsers)
+    Returns {base_command: [(metric_name, stages, parser), ...]} where stages extract the metric
+    from the base command's output. Commands the planner cannot parse run as-is.
+    """
+    parsers = parsers or {}
+    plan = {}
+    for metric, command in commands.items():
+        command = str(command).strip()
+        if not command:
+            continue
+        segments = split_pipeline(command)
+        stages = compile_filters(segments[1:]) if segments else None
+        if stages is None:
+            base, stages = command, []
+        else:
+            base = segments[0]
+        plan.setdefault(base, []).append((metric, stages, compile_parser(parsers.get(metric))))
+    return plan
+
+def run_command(command, timeout=COMMAND_TIMEOUT):
+    """Run a shell command and return its stdout ("" on failure or timeout)."""
+    try:
+        result = subprocess.run(
+            command, shell=True, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout
+        )
+        return result.stdout
+    except (subprocess.SubprocessError, OSError):
+        return ""
+
+def run_base_command(command, timeout=COMMAND_TIMEOUT):
+    """Serve a base command from a native reader when one covers it, otherwise run it in a shell."""
+    for pattern, reader in NATIVE_READERS:
+        m = pattern.match(command)
+        if m:
+            output = reader(*m.groups())
+            if output is not None:
+                return output
+            break
+    return run_command(command, timeout)
+
+def read_text(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+def to_value(output):
+    """Same conversion the monitor has always used: float, or NaN if empty/non-numeric."""
+    output = output.strip()
+    try:
+        return float(output) if output else float("nan")
+    except ValueError:
+        return float("nan")
+
+def apply_stages(output, stages):
+    if not stages:
+        return output
+    lines = output.splitlines()
+    for stage in stages:
+        lines = stage(lines)
+    return "\n".join(lines)
+
+def run_collection_plan(plan, runner=run_base_command, batch_runner=None):
+    """Run each base command once and fan its output out to every metric.
+
+    batch_runner([base, ...]) -> {base: output} runs all of them in one go instead (e.g. one SSH
+    round trip per tick for a remote host).
+    Returns {metric: float} for single metrics and {family: {key: float}} for parsed families.
+    """
+    outputs = batch_runner(list(plan)) if batch_runner and plan else None
+    values = {}
+    for base, members in plan.items():
+        output = runner(base) if outputs is None else outputs.get(base, "")
+        for metric, stages, parser in members:
+            text = apply_stages(output, stages)
+            values[metric] = parser(text) if parser else to_value(text)
+    return values
@@ -0,0 +1,77 @@
+import math
+import re
+
+from engine.registry import MetricSpec
+
+# Counter -> rate derivation. Cumulative counters (NIC queue packets/bytes/drops/kicks, /proc/net/dev,
+# disk I/O totals) are stored raw and as "<metric> rate" per-second series.
+# A metric is a counter when its sheet row says so (Counter = 1 / 0), otherwise when its name ends
+# in a counter-like word.
+
+COUNTER_NAME = re.compile(r"(?:packets|bytes|drops?|kicks|errs|errors|timeouts|redirects|xdp_tx|xdp_tx_drops|"
+                          r"ios|sectors|merges|interrupts)$", re.IGNORECASE)
+RATE_SUFFIX = " rate"
+_WRAPS = (2 ** 32, 2 ** 64)
+
+def is_counter(spec, metric):
+    if spec.counter == spec.counter:    # explicit in the sheet
+        return bool(spec.counter)
+    return bool(COUNTER_NAME.search(metric))
+
+def counter_delta(prev, value):
+    """Increase between two counter readings; handles 32/64-bit wrap, None on a reset."""
+    if value >= prev:
+        return value - prev
+    for limit in _WRAPS:
+        # a wrap leaves the old reading near the top and the new one near the bottom of the range
+        if prev < limit and prev > limit * 0.75 and value < limit * 0.25:
+            return value + limit - prev
+    return None
+
+def split_specs(spec):
+    """(value spec, rate spec) for a counter row; thresholds go to whichever series Threshold_On names."""
+    on_rate = spec.threshold_on == "rate"
+    nan = math.nan
+    value_spec = spec if not on_rate else MetricSpec(
+        spec.name, spec.section, spec.template, spec.command, spec.parser, spec.unit,
+        nan, nan, nan, nan, spec.rate_max, spec.counter, spec.threshold_on)
+    thresholds = (spec.min_thresh, spec.max_thresh, spec.alert_for, spec.hysteresis) if on_rate else (nan,) * 4
+    rate_spec = MetricSpec(
+        spec.name + RATE_SUFFIX, spec.section, spec.template, spec.command, spec.parser,
+        f"{spec.unit}/s" if spec.unit else "/s", *thresholds, nan, 0, "value")
+    return value_spec, rate_spec
+
+class RateDeriver:
+    """Previous reading per counter; update() returns the per-second rate (NaN when unknown)."""
+
+    def __init__(self):
+        self._prev = {}     # metric -> (value, ts_ns)
+        self._specs = {}    # spec name -> (spec, value spec, rate spec)
+
+    def clear(self):
+        self._prev = {}
+
+    def forget(self, keep):
+        for metric in list(self._prev):
+            if metric not in keep:
+                del self._prev[metric]
+        self._specs = {}
+
+    def specs(self, spec):
+        """split_specs(spec), computed once per configured spec."""
+        cached = self._specs.get(spec.name)
+        if cached is None or cached[0] is not spec:
+            cached = self._specs[spec.name] = (spec,) + split_specs(spec)
+        return cached[1], cached[2]
+
+    def update(self, metric, ts_ns, value):
+        if value != value:
+            return math.nan
+        prev = self._prev.get(metric)
+        self._prev[metric] = (value, ts_ns)
+        if prev is None or ts_ns <= prev[1]:
+            return math.nan
+        delta = counter_delta(prev[0], value)
+        if delta is None:
+            return math.nan  # counter reset: next sample starts from the new baseline
+        return delta / ((ts_ns - prev[1]) / 1e9)
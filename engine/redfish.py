@@ -0,0 +1,148 @@
+import threading
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+# Redfish client for one BMC: a keep-alive connection pool (one TCP/TLS handshake for a whole
+# collection), a SessionService token instead of Basic auth on every request, and the real
+# System / Chassis member IDs discovered once and reused ("/Systems/1/Bios" -> "/Systems/437XR1138R2/Bios").
+
+REQUEST_TIMEOUT = 8
+POOL_SIZE = 4
+SERVICE_ROOT = "/redfish/v1"
+SESSIONS_PATH = "/redfish/v1/SessionService/Sessions"
+DISCOVERED = ("Systems", "Chassis", "Managers")
+MEMBER_TTL = 600            # seconds before member IDs are discovered again (board swap, BMC reflash)
+
+# BMCs ship self-signed certificates; requests are made with verify=False like before
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+class RedfishClient:
+    """Pooled, session-authenticated Redfish access to one BMC. Safe to share between threads."""
+
+    def __init__(self, bmc_ip, port=8000, use_https=False, username="ADMIN", password="ADMIN",
+                 timeout=REQUEST_TIMEOUT, verify=False):
+        protocol = "https" if use_https else "http"
+        self.base_url = f"{protocol}://{bmc_ip}:{port}"
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.auth_mode = None       # "session" | "basic" | "none" once logged in
+
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._session_uri = None
+        self._members = {}          # "Systems" -> ("/redfish/v1/Systems/437XR1138R2", discovered at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # TODO: Authentication
+
+    def login(self):
+        """Open a SessionService session (X-Auth-Token); falls back to Basic auth if the BMC has none.
+
+        Any other failure (BMC unreachable, credentials rejected) raises and the next call tries again.
+        """
+        with self._lock:
+            if self.auth_mode is not None:
+                return self.auth_mode
+            if not (self.username and self.password):
+                self.auth_mode = "none"
+                return self.auth_mode
+            resp = self.session.post(
+                self.base_url + SESSIONS_PATH,
+                json={"UserName": self.username, "Password": self.password},
+                timeout=self.timeout
+            )
+            if resp.status_code not in (404, 405):   # 404 / 405: no SessionService, use Basic auth
+                resp.raise_for_status()
+            token = resp.headers.get("X-Auth-Token") if resp.ok else None
+            if token:
+                self.session.headers["X-Auth-Token"] = token
+                self.session.auth = None
+                self._session_uri = resp.headers.get("Location")
+                if not self._session_uri:
+                    try:
+                        self._session_uri = resp.json().get("@odata.id")
+                    except ValueError:
+                        pass
+                self.auth_mode = "session"
+            else:
+                self.session.auth = HTTPBasicAuth(self.username, self.password)
+                self.auth_mode = "basic"
+            return self.auth_mode
+
+    def logout(self):
+        """Delete the BMC session (BMCs allow only a few at a time)."""
+        with self._lock:
+            uri, self._session_uri = self._session_uri, None
+            token = self.session.headers.get("X-Auth-Token")
+            self.auth_mode = None
+        if uri and token:
+            try:
+                url = uri if uri.startswith("http") else self.base_url + uri
+                self.session.delete(url, headers={"X-Auth-Token": token}, timeout=self.timeout)
+            except requests.RequestException:
+                pass
+        with self._lock:
+            if self.session.headers.get("X-Auth-Token") == token:   # unless another thread logged in meanwhile
+                self.session.headers.pop("X-Auth-Token", None)
+
+    def reset(self):
+        """Log out and forget the discovered member IDs: the next request logs in and discovers again."""
+        self._members.clear()
+        self.logout()
+
+    def close(self):
+        self.logout()
+        self.session.close()
+
+    # TODO: Requests
+
+    def _get(self, path):
+        resp = self.session.get(self.base_url + path, timeout=self.timeout)
+        if resp.status_code == 401 and self.auth_mode == "session":
+            # Token expired or the BMC dropped the session: log in again once
+            self.logout()
+            self.login()
+            resp = self.session.get(self.base_url + path, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def member(self, collection):
+        """@odata.id of the first member of /redfish/v1/<collection> (cached for MEMBER_TTL), or None."""
+        cached = self._members.get(collection)
+        if cached is None or time.monotonic() - cached[1] > MEMBER_TTL:
+            members = self._get(f"{SERVICE_ROOT}/{collection}").get("Members", [])
+            cached = (members[0]["@odata.id"].rstrip("/") if members else None, time.monotonic())
+            self._members[collection] = cached
+        return cached[0]
+
+    def resolve(self, endpoint):
+        """Replace the placeholder ID 1 of Systems / Chassis / Managers with the discovered one."""
+        for collection in DISCOVERED:
+            placeholder = f"{SERVICE_ROOT}/{collection}/1"
+            if endpoint == placeholder or endpoint.startswith(placeholder + "/"):
+                real = self.member(collection)
+                if real:
+                    endpoint = real + endpoint[len(placeholder):]
+                break
+        return endpoint
+
+    def get(self, endpoint):
+        """JSON of an endpoint ("/redfish/v1/Systems/1/Bios" style paths are resolved first)."""
+        self.login()
+        return self._get(self.resolve(endpoint))
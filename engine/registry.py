@@ -0,0 +1,148 @@
+import math
+
+from engine.planner import build_collection_plan, run_collection_plan
+from engine.templates import expand
+
+def _float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return value
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value).strip()
+
+class MetricSpec:
+    """Everything the hot loop needs about one monitored row, resolved once."""
+
+    __slots__ = ("name", "section", "template", "command", "parser", "unit", "min_thresh", "max_thresh",
+                 "alert_for", "hysteresis", "rate_max", "counter", "threshold_on", "expansions")
+
+    def __init__(self, name, section, template, command, parser, unit, min_thresh, max_thresh,
+                 alert_for=math.nan, hysteresis=math.nan, rate_max=math.nan, counter=math.nan, threshold_on="value",
+                 expansions=None):
+        self.name = name
+        self.section = section
+        self.template = template
+        self.command = command
+        self.parser = parser
+        self.unit = unit
+        self.min_thresh = min_thresh
+        self.max_thresh = max_thresh
+        self.alert_for = alert_for
+        self.hysteresis = hysteresis
+        self.rate_max = rate_max
+        self.counter = counter              # 1 / 0 from the sheet, NaN = infer from the metric name
+        self.threshold_on = threshold_on    # "value" or "rate" (counters)
+        # [(metric, command, iface, queue)]: one per {iface}/{queue} expansion (engine.templates)
+        self.expansions = expansions or [(name, command, None, None)]
+
+    @property
+    def is_family(self):
+        return bool(self.parser)
+
+    @property
+    def is_template(self):
+        return len(self.expansions) != 1 or self.expansions[0][0] != self.name
+
+    @property
+    def has_queues(self):
+        return any(e[3] is not None for e in self.expansions)
+
+    def readings(self, values):
+        """(metric, value, iface, queue) per reading of collected values; templates and families flattened."""
+        for key, _, iface, queue in self.expansions:
+            value = values.get(key)
+            if self.is_family:
+                for member, v in (value or {}).items():
+                    yield f"{key} {member}", v, iface, queue
+            else:
+                yield key, math.nan if value is None else value, iface, queue
+
+class MetricRegistry:
+    """Compiled view of load_dynamic_df(): specs by name and by base command, plus the collection plan."""
+
+    __slots__ = ("by_name", "by_command", "_owner", "_plan", "_subplans")
+
+    def __init__(self, specs):
+        self.by_name = {s.name: s for s in specs}
+        # Plan entries are per expansion; _owner maps each back to its row
+        self._owner = {key: s for s in specs for key, _, _, _ in s.expansions}
+        self._plan = build_collection_plan(
+            {key: command for s in specs for key, command, _, _ in s.expansions},
+            {key: s.parser for s in specs if s.parser for key, _, _, _ in s.expansions}
+        )
+        self.by_command = {}
+        for base, members in self._plan.items():
+            owners = self.by_command[base] = []
+            for m in members:
+                if self._owner[m[0]] not in owners:
+                    owners.append(self._owner[m[0]])
+        self._subplans = {}
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+    def __iter__(self):
+        return iter(self.by_name.values())
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def get(self, name, default=None):
+        return self.by_name.get(name, default)
+
+    def plan(self, names=None):
+        """Collection plan restricted to names (cached per selection)."""
+        if names is None:
+            return self._plan
+        key = frozenset(names)
+        plan = self._subplans.get(key)
+        if plan is None:
+            plan = {}
+            for base, members in self._plan.items():
+                selected = [m for m in members if self._owner[m[0]].name in key]
+                if selected:
+                    plan[base] = selected
+            self._subplans[key] = plan
+        return plan
+
+    def collect(self, names=None, runner=None):
+        """One run per distinct base command; {metric: float} / {family: {key: float}} keyed by expansion."""
+        plan = self.plan(names)
+        return run_collection_plan(plan, runner) if runner else run_collection_plan(plan)
+
+def build_registry(records, interfaces=None, queues=None):
+    """Build a MetricRegistry from load_dynamic_df() records (df.to_dict("records")).
+
+    Templates expand over interfaces / queues (see engine.templates.expand), this machine's by default.
+    """
+    specs = []
+    for r in records:
+        name = _text(r.get("Subsection_Title"))
+        command = _text(r.get("command"))
+        if not name or not command:
+            continue
+        specs.append(MetricSpec(
+            name=name,
+            section=_text(r.get("Section_Title")),
+            template=_text(r.get("Command")),
+            command=command,
+            parser=_text(r.get("parser")),
+            unit=_text(r.get("unit")),
+            min_thresh=_float(r.get("min_thresh")),
+            max_thresh=_float(r.get("max_thresh")),
+            alert_for=_float(r.get("alert_for")),
+            hysteresis=_float(r.get("hysteresis")),
+            rate_max=_float(r.get("rate_max")),
+            counter=_float(r.get("counter")),
+            threshold_on=_text(r.get("threshold_on")).lower() or "value",
+            expansions=expand(name, command, interfaces, queues),
+        ))
+    return MetricRegistry(specs)
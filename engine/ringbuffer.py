@@ -0,0 +1,51 @@
+import numpy as np
+
+class RingBuffer:
+    """Fixed-size time series buffer: int64 epoch-ns timestamps + float64 values.
+
+    Storage is preallocated at twice the capacity and every sample is written to both
+    halves, so the latest N samples are always one contiguous slice. Appends never
+    allocate and window reads return views (valid until the next append).
+    """
+
+    __slots__ = ("capacity", "_ts", "_values", "_pos", "_count")
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._ts = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.full(2 * self.capacity, np.nan, dtype=np.float64)
+        self._pos = 0       # next write slot in [0, capacity)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, ts_ns, value):
+        pos, cap = self._pos, self.capacity
+        self._ts[pos] = self._ts[pos + cap] = ts_ns
+        self._values[pos] = self._values[pos + cap] = value
+        self._pos = pos + 1 if pos + 1 < cap else 0
+        if self._count < cap:
+            self._count += 1
+
+    def window(self, n=None):
+        """Views of the latest n samples (all stored samples by default), oldest first."""
+        n = self._count if n is None else min(int(n), self._count)
+        end = self._pos + self.capacity
+        return self._ts[end - n:end], self._values[end - n:end]
+
+    def since(self, ts_ns):
+        """Views of the samples with timestamp >= ts_ns."""
+        ts, values = self.window()
+        start = int(np.searchsorted(ts, ts_ns, side="left"))
+        return ts[start:], values[start:]
+
+    def last(self):
+        if not self._count:
+            return None
+        i = self._pos - 1 + self.capacity
+        return int(self._ts[i]), float(self._values[i])
+
+    def clear(self):
+        self._pos = 0
+        self._count = 0
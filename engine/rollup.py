@@ -0,0 +1,254 @@
+import glob
+import math
+import os
+import time
+from datetime import timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from engine.history import HISTORY_DIR, HistoryStore, PartitionCache, compact_partition, partition_dirs, write_parquet
+from engine.sketch import QUANTILES, LogHistogram, merge_arrays
+
+# Pre-aggregated history: per metric and per bucket, count / min / max / sum / sum of squares / last,
+# plus a log-histogram quantile sketch (engine.sketch) for percentiles. All fields merge across buckets (and across duplicate buckets after a restart), so any window's
+# min, max, mean and std come from a few thousand rollup rows instead of millions of raw samples.
+
+ROLLUP_DIR = "_rollups"                 # leading "_" keeps it out of the raw dataset scan
+RESOLUTIONS = {"1m": 60, "1h": 3600}   # name -> bucket seconds, finest first
+MIN_POINTS = 200                        # coarsest resolution that still gives this many points wins
+
+ROLLUP_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us")),
+    ("metric", pa.dictionary(pa.int32(), pa.string())),
+    ("count", pa.int64()),
+    ("min", pa.float64()),
+    ("max", pa.float64()),
+    ("sum", pa.float64()),
+    ("sumsq", pa.float64()),
+    ("last", pa.float64()),
+    ("sketch_keys", pa.list_(pa.int32())),
+    ("sketch_counts", pa.list_(pa.int64())),
+    ("sketch_zeros", pa.int64()),
+])
+STAT_COLUMNS = ["timestamp", "count", "min", "max", "sum", "sumsq", "last"]
+SKETCH_COLUMNS = ["sketch_keys", "sketch_counts", "sketch_zeros"]
+
+def bucket_start(t, seconds):
+    """Start of the bucket containing naive datetime t."""
+    if seconds >= 3600:
+        return t.replace(minute=0, second=0, microsecond=0)
+    return t.replace(second=0, microsecond=0)
+
+class RollupSink:
+    """History writer sink that maintains 1m / 1h rollups as samples arrive.
+
+    Each metric has one open bucket per resolution; it is written out once a sample
+    (of any metric) lands past its end, and on close.
+    """
+
+    def __init__(self, root=HISTORY_DIR, resolutions=RESOLUTIONS):
+        self.root = os.path.join(root, ROLLUP_DIR)
+        self.resolutions = resolutions
+        self._open = {res: {} for res in resolutions}   # res -> metric -> [start, count, min, max, sum, sumsq, last, sketch]
+        self._dates = {}                                  # res -> date being appended to
+        for res in resolutions:
+            os.makedirs(os.path.join(self.root, res), exist_ok=True)
+            for directory in glob.glob(os.path.join(self.root, res, "date=*", "hour=*")):
+                compact_partition(directory)
+
+    def write(self, rows):
+        if not rows:
+            return
+        latest = max(r["time"] for r in rows)
+        for res, seconds in self.resolutions.items():
+            buckets, done = self._open[res], []
+            for r in rows:
+                start = bucket_start(r["time"], seconds)
+                b = buckets.get(r["metric"])
+                if b is None or b[0] != start:
+                    if b is not None:
+                        done.append((r["metric"], b))
+                    b = buckets[r["metric"]] = [start, 0, math.inf, -math.inf, 0.0, 0.0, math.nan, LogHistogram()]
+                value = r["value"]
+                if value == value:
+                    b[1] += 1
+                    b[2] = min(b[2], value)
+                    b[3] = max(b[3], value)
+                    b[4] += value
+                    b[5] += value * value
+                    b[6] = value
+                    b[7].add(value)
+            # Metrics that stopped reporting: close buckets the clock has moved past
+            cutoff = bucket_start(latest, seconds)
+            for metric, b in list(buckets.items()):
+                if b[0] < cutoff:
+                    done.append((metric, buckets.pop(metric)))
+            self._emit(res, done)
+
+    def _emit(self, res, done):
+        done = [(m, b) for m, b in done if b[1]]
+        if not done:
+            return
+        parts = {}
+        for metric, b in done:
+            parts.setdefault(b[0].date().isoformat(), []).append((metric, b))
+        for date, part in sorted(parts.items()):
+            previous = self._dates.get(res)
+            if previous and previous < date:
+                for directory in glob.glob(os.path.join(self.root, res, f"date={previous}", "hour=*")):
+                    compact_partition(directory)
+            self._dates[res] = max(date, previous or date)
+            table = pa.table({
+                "timestamp": [b[0] for _, b in part],
+                "metric": pa.array([m for m, _ in part], pa.string()).dictionary_encode(),
+                "count": [b[1] for _, b in part],
+                "min": [b[2] for _, b in part],
+                "max": [b[3] for _, b in part],
+                "sum": [b[4] for _, b in part],
+                "sumsq": [b[5] for _, b in part],
+                "last": [b[6] for _, b in part],
+                "sketch_keys": [b[7].to_lists()[0] for _, b in part],
+                "sketch_counts": [b[7].to_lists()[1] for _, b in part],
+                "sketch_zeros": [b[7].zeros for _, b in part],
+            }, schema=ROLLUP_SCHEMA)
+            # hour=00 keeps the date=/hour= layout shared with the raw store; one partition per day
+            directory = os.path.join(self.root, res, f"date={date}", "hour=00")
+            os.makedirs(directory, exist_ok=True)
+            write_parquet(table, os.path.join(directory, f"part-{time.time_ns()}.parquet"))
+
+    def close(self):
+        for res in self.resolutions:
+            done = list(self._open[res].items())
+            self._open[res] = {}
+            self._emit(res, done)
+
+def choose_resolution(start, end, min_points=MIN_POINTS, resolutions=RESOLUTIONS):
+    """Coarsest rollup giving at least min_points buckets over [start, end]; None means use raw samples."""
+    seconds = (end - start).total_seconds()
+    best = None
+    for res, size in resolutions.items():
+        if seconds / size >= min_points:
+            best = res
+    return best
+
+class RollupStore:
+    """Read side of the rollups: merged buckets for one metric over a time range.
+
+    Buckets are only written once they close, so the newest (open) ones are computed from the raw
+    samples after the last written bucket; windows reaching "now" include the current hour.
+    """
+
+    def __init__(self, root=HISTORY_DIR, raw=None):
+        self.root = os.path.join(root, ROLLUP_DIR)
+        self.cache = PartitionCache()
+        self.raw = raw or HistoryStore(root)
+
+    def query(self, metric, resolution, start=None, end=None):
+        """Buckets as a pyarrow Table (timestamp, count, min, max, sum, sumsq, last), duplicates merged."""
+        table = self._read(metric, resolution, start, end, STAT_COLUMNS)
+        if table is None:
+            return ROLLUP_SCHEMA.empty_table().select(STAT_COLUMNS)
+        tail = self._raw_tail(metric, resolution, table, start, end)
+        if tail is not None:
+            table = pa.concat_tables([table.cast(tail.schema), tail])
+        table = table.sort_by("timestamp")
+        if len(table) == len(set(table.column("timestamp").to_pylist())):
+            return table
+        merged = table.group_by("timestamp", use_threads=False).aggregate([
+            ("count", "sum"), ("min", "min"), ("max", "max"), ("sum", "sum"), ("sumsq", "sum"), ("last", "last"),
+        ])
+        return pa.table({
+            "timestamp": merged.column("timestamp"),
+            **{c: merged.column(f"{c}_{agg}") for c, agg in
+               (("count", "sum"), ("min", "min"), ("max", "max"), ("sum", "sum"), ("sumsq", "sum"), ("last", "last"))},
+        }).sort_by("timestamp")
+
+    def percentiles(self, metric, resolution, start=None, end=None, qs=QUANTILES):
+        """Window percentiles from the merged bucket sketches plus the open buckets' raw samples.
+
+        Before the first bucket of the window closes, the sketch is built from the raw samples alone.
+        """
+        table = self._read(metric, resolution, start, end, ["timestamp"] + SKETCH_COLUMNS)
+        if table is not None and "sketch_keys" in table.column_names:
+            keys = pc.list_flatten(table.column("sketch_keys")).to_numpy()
+            counts = pc.list_flatten(table.column("sketch_counts")).to_numpy()
+            zeros = pc.sum(table.column("sketch_zeros")).as_py() or 0
+            sketch = merge_arrays(keys, counts, zeros)
+        else:
+            sketch = LogHistogram()
+        for value in self._tail_values(metric, resolution, table, start, end):
+            sketch.add(value)
+        return sketch.quantiles(qs)
+
+    # TODO: Open buckets (raw samples after the last written bucket)
+
+    def _tail(self, metric, resolution, table, start, end):
+        """Raw samples (timestamp, value) newer than the last written bucket, NaNs dropped; None if there are none.
+
+        With no written bucket in range (the first one has not closed yet, or history recorded before
+        rollups existed) that is every raw sample of the window.
+        """
+        newest = None if table is None or not len(table) else pc.max(table.column("timestamp")).as_py()
+        after = start if newest is None else newest + timedelta(seconds=RESOLUTIONS[resolution])
+        if start is not None and after is not None:
+            after = max(after, start)
+        if end is not None and after is not None and after > end:
+            return None
+        raw = self.raw.query(metric, after, end)
+        if len(raw):
+            value = raw.column("value")
+            raw = raw.filter(pc.and_(pc.is_valid(value), pc.invert(pc.is_nan(value))))
+        return raw if len(raw) else None
+
+    def _tail_values(self, metric, resolution, table, start, end):
+        raw = self._tail(metric, resolution, table, start, end)
+        return [] if raw is None else raw.column("value").to_pylist()
+
+    def _raw_tail(self, metric, resolution, table, start, end):
+        """Open buckets as a Table of STAT_COLUMNS, or None when the rollups are up to date."""
+        raw = self._tail(metric, resolution, table, start, end)
+        if raw is None:
+            return None
+        unit = "hour" if RESOLUTIONS[resolution] >= 3600 else "minute"
+        raw = raw.append_column("bucket", pc.floor_temporal(raw.column("timestamp"), unit=unit))
+        raw = raw.append_column("sq", pc.multiply(raw.column("value"), raw.column("value")))
+        grouped = raw.group_by("bucket", use_threads=False).aggregate([
+            ("value", "count"), ("value", "min"), ("value", "max"), ("value", "sum"), ("sq", "sum"), ("value", "last"),
+        ])
+        return pa.table({
+            "timestamp": grouped.column("bucket").cast(pa.timestamp("us")),
+            "count": grouped.column("value_count").cast(pa.int64()),
+            "min": grouped.column("value_min"),
+            "max": grouped.column("value_max"),
+            "sum": grouped.column("value_sum"),
+            "sumsq": grouped.column("sq_sum"),
+            "last": grouped.column("value_last"),
+        })
+
+    def _read(self, metric, resolution, start, end, columns):
+        predicate = ds.field("metric") == metric
+        if start is not None:
+            predicate = predicate & (ds.field("timestamp") >= pa.scalar(bucket_start(start, RESOLUTIONS[resolution]), pa.timestamp("us")))
+        if end is not None:
+            predicate = predicate & (ds.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+        directories = partition_dirs(os.path.join(self.root, resolution), start, end, hourly=False)
+        return self.cache.read(directories, predicate, columns)
+
+def summarize(table):
+    """Merge rollup rows into {count, min, max, mean, std} for the whole window."""
+    count = sum(table.column("count").to_pylist()) if len(table) else 0
+    if not count:
+        return {"count": 0, "min": math.nan, "max": math.nan, "mean": math.nan, "std": math.nan}
+    total = sum(table.column("sum").to_pylist())
+    sumsq = sum(table.column("sumsq").to_pylist())
+    mean = total / count
+    var = (sumsq - total * mean) / (count - 1) if count > 1 else 0.0
+    return {
+        "count": count,
+        "min": min(table.column("min").to_pylist()),
+        "max": max(table.column("max").to_pylist()),
+        "mean": mean,
+        "std": math.sqrt(max(var, 0.0)),
+    }
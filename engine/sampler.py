@@ -0,0 +1,264 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from engine.alerts import AlertEngine
+from engine.anomaly import AnomalyDetector
+from engine.history import ALERTS_FILE, EVENTS_FILE, HISTORY_DIR, CsvSink, EventLog, HistoryStore, HistoryWriter, ParquetSink
+from engine.planner import run_collection_plan
+from engine.rates import RATE_SUFFIX, RateDeriver, is_counter
+from engine.ringbuffer import RingBuffer
+from engine.registry import MetricSpec
+from engine.rollup import RollupSink, RollupStore
+from engine.templates import aggregate, aggregate_name
+
+HISTORY_CSV = "monitoring_history.csv"
+MAX_POINTS = 1000
+HIGH_RES_POINTS = 12000     # 20 minutes at 100 ms
+ANOMALY_HOLD = 60           # seconds an anomaly stays flagged in snapshots (at least 5 intervals)
+
+class Sampler:
+    """Long-lived collector: samples the configured metrics at a fixed cadence into a shared buffer.
+
+    One instance per process (see data.get_sampler). The Streamlit fragment only reads from it,
+    so sampling keeps going across reruns, reloads and any number of open tabs.
+    """
+
+    def __init__(self, history_dir=HISTORY_DIR, history_csv=HISTORY_CSV, max_points=MAX_POINTS, batch_runner=None):
+        self.history_csv = history_csv
+        self.batch_runner = batch_runner    # see engine.planner.run_collection_plan (engine.fleet: remote hosts)
+        self.store = HistoryStore(history_dir)
+        self.rollups = RollupStore(history_dir)
+        self.writer = HistoryWriter([ParquetSink(history_dir), RollupSink(history_dir)])
+        self._csv_sink = None
+        self.detector = AnomalyDetector()
+        self.rates = RateDeriver()
+        self.events = EventLog(os.path.join(history_dir, EVENTS_FILE))
+        self.alerts = AlertEngine(EventLog(os.path.join(history_dir, ALERTS_FILE)))
+        self.max_points = max_points
+        self.interval = 10.0
+
+        self._lock = threading.Lock()
+        self._specs = []            # MetricSpec objects being sampled (engine.registry)
+        self._plan = {}
+        self._members = {}          # family / template -> member metric names seen so far
+        self._aggregate_specs = {}  # queue aggregate metric -> (owner spec, MetricSpec)
+        self._history = {}          # metric -> RingBuffer
+        self._latest = {}
+        self._anomalies = {}        # metric -> (kind, detail, when)
+        self._last_tick = None
+        self.last_error = None
+
+        self._running = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    # TODO: Control
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def metrics(self):
+        return [spec.name for spec in self._specs]
+
+    def configure(self, registry, metrics, interval, max_points=None):
+        """Sample the named metrics of a MetricRegistry every interval seconds.
+
+        Family specs (dynamic_multi with a parser) expand into many metrics at sample time.
+        """
+        with self._lock:
+            if max_points and max_points != self.max_points:
+                self.max_points = int(max_points)
+                self._history = {}  # buffers are fixed-size; reallocate at the new depth
+            self._specs = [registry[m] for m in metrics if m in registry]
+            self._plan = registry.plan(self.metrics)
+            keep = set(self.metrics)
+            for spec in self._specs:
+                keep.update(self._members.get(spec.name, ()))
+            for metric in list(self._anomalies):
+                if metric not in keep:
+                    self._anomalies.pop(metric)
+            self.detector.forget(keep)
+            self.rates.forget(keep)
+            self._aggregate_specs = {}
+        self.interval = float(interval)
+        self._wake.set()
+
+    @property
+    def csv_export(self):
+        return self._csv_sink is not None
+
+    def set_csv_export(self, enabled):
+        """Optionally mirror every sample into monitoring_history.csv as well as the Parquet store."""
+        if enabled and self._csv_sink is None:
+            self._csv_sink = CsvSink(self.history_csv)
+            self.writer.add_sink(self._csv_sink)
+        elif not enabled and self._csv_sink is not None:
+            self.writer.remove_sink(self._csv_sink)
+            self._csv_sink = None
+
+    def start(self):
+        self._running.set()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="metric-sampler", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def clear(self):
+        with self._lock:
+            self._history = {}
+            self._latest = {}
+            self._anomalies = {}
+            self.detector.clear()
+            self.rates.clear()
+            self._members = {}
+            self._last_tick = None
+
+    # TODO: Reads (used by the UI)
+
+    def snapshot(self, metrics=None):
+        """Consistent copy of latest values, alerts and history for rendering.
+
+        History is {metric: (ts_ns, values)} NumPy arrays, copied once per read so the
+        caller is unaffected by later appends. Family names expand to their members.
+        """
+        with self._lock:
+            names = []
+            for m in (self.metrics if metrics is None else metrics):
+                names.extend(self._members.get(m, [m]))
+            history = {}
+            for m in names:
+                if m in self._history:
+                    ts, values = self._history[m].window()
+                    history[m] = (ts.copy(), values.copy())
+            sampled = set()
+            for spec in self._specs:
+                sampled.update(self._members.get(spec.name, [spec.name]))
+            hold = max(ANOMALY_HOLD, 5 * self.interval)
+            anomalies = {}
+            if self._last_tick is not None:
+                anomalies = {m: a for m, a in self._anomalies.items() if (self._last_tick - a[2]).total_seconds() <= hold}
+            return {
+                "time": self._last_tick,
+                "values": dict(self._latest),
+                "alerts": self.alerts.active(sampled),
+                "pending": self.alerts.pending(sampled),
+                "anomalies": anomalies,
+                "members": {f: list(ms) for f, ms in self._members.items()},
+                "history": history,
+            }
+
+    # TODO: Sampling loop
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            if self._running.is_set():
+                try:
+                    self._tick()
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)  # keep sampling; surfaced in the Monitor tab
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                # Overran the cadence: skip the missed slots instead of bursting
+                next_tick += math.ceil((now - next_tick) / self.interval) * self.interval
+            self._wake.clear()
+            if self._wake.wait(next_tick - now):
+                next_tick = time.monotonic()  # reconfigured / started: sample right away
+
+    def _tick(self):
+        with self._lock:
+            plan, specs = self._plan, self._specs
+        now = datetime.now()
+        now_ns = time.time_ns()
+        values = run_collection_plan(plan, batch_runner=self.batch_runner)
+
+        rows, events, samples = [], [], []
+        with self._lock:
+            self._last_tick = now
+            for metric, value, spec, derived in self._expand(specs, values, now_ns):
+                self._latest[metric] = value
+                samples.append((metric, value, spec))
+
+                ### Anomaly detection (EWMA z-score, CUSUM, counter resets); the detector
+                ### already judges raw counters by their rate, so derived series are skipped
+                for kind, detail in ([] if derived else self.detector.update(metric, now_ns, value)):
+                    self._anomalies[metric] = (kind, detail, now)
+                    events.append({"time": now.isoformat(), "type": "anomaly", "metric": metric,
+                                   "kind": kind, "detail": detail, "value": value})
+
+                ### Bounded in-memory history
+                if metric not in self._history:
+                    self._history[metric] = RingBuffer(self.max_points)
+                self._history[metric].append(now_ns, value)
+
+                rows.append({
+                    "time": now,
+                    "timestamp": now.isoformat(),
+                    "metric": metric,
+                    "value": value,
+                    "unit": spec.unit
+                })
+
+            ### Alert rules (thresholds, Alert_For, Hysteresis, Rate_Max) in one vectorized pass
+            self.alerts.evaluate(now, samples)
+
+        ### Persistent history (batched; the writer thread does the file I/O)
+        self.writer.write(rows)
+        self.events.append(events)
+
+    def _expand(self, specs, values, now_ns):
+        """Yield (metric, value, spec, derived) with families flattened to "family key" members.
+
+        Templates yield one metric per interface / queue, plus per-interface sum, max and
+        imbalance across queues. Counters are followed by their "<metric> rate" series (derived=True).
+        """
+        for spec in specs:
+            readings = list(spec.readings(values))
+            members = None
+            if spec.is_family or spec.is_template or any(is_counter(spec, r[0]) for r in readings):
+                members = self._members.setdefault(spec.name, {})  # insertion-ordered set
+            per_iface = {}  # iface -> queue values (their rates for counters) to aggregate
+            for metric, value, iface, queue in readings:
+                if not is_counter(spec, metric):
+                    if members is not None:
+                        members[metric] = None
+                    if queue is not None:
+                        per_iface.setdefault(iface, []).append(value)
+                    yield metric, value, spec, False
+                    continue
+                value_spec, rate_spec = self.rates.specs(spec)
+                members[metric] = None
+                members[metric + RATE_SUFFIX] = None
+                rate = self.rates.update(metric, now_ns, value)
+                if queue is not None:
+                    per_iface.setdefault(iface, []).append(rate)
+                yield metric, value, value_spec, False
+                yield metric + RATE_SUFFIX, rate, rate_spec, True
+            for iface, queue_values in per_iface.items():
+                base = aggregate_name(spec.name, iface) + (RATE_SUFFIX if is_counter(spec, spec.name) else "")
+                for agg, value in aggregate(queue_values).items():
+                    metric = f"{base} {agg}"
+                    members[metric] = None
+                    yield metric, value, self._aggregate_spec(spec, metric, agg), False
+
+    def _aggregate_spec(self, spec, metric, agg):
+        """Threshold-free spec for a per-interface queue aggregate (cached per configured spec)."""
+        cached = self._aggregate_specs.get(metric)
+        if cached is None or cached[0] is not spec:
+            unit = "" if agg == "imbalance" else spec.unit
+            if is_counter(spec, spec.name):
+                unit = f"{unit}/s" if unit else "/s"
+            nan = math.nan
+            cached = self._aggregate_specs[metric] = (spec, MetricSpec(
+                metric, spec.section, spec.template, spec.command, "", unit, nan, nan, counter=0))
+        return cached[1]
@@ -0,0 +1,92 @@
+import math
+
+from engine.collector import parse_policy
+from engine.templates import expand
+
+# The Sections sheet without pandas: rows for the one-shot collection and records for the
+# metric registry, shaped like data.load_sections() / data.load_dynamic_df() so the headless
+# CLI (python -m engine) and the Streamlit tabs build the same things from the same file.
+
+SECTIONS_FILE = "sections_config.xlsx"
+SHEET_NAME = "Sections"
+
+def _text(value):
+    """Stripped cell text; empty cells (None, NaN, or "nan" from a pandas astype(str)) are ""."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    text = str(value).strip()
+    return "" if text.lower() == "nan" else text
+
+def _float(value):
+    try:
+        return float(value) if _text(value) else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+def read_rows(path=SECTIONS_FILE, sheet=SHEET_NAME):
+    """Sheet rows as dicts keyed by the stripped header (openpyxl, read-only)."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = [_text(h) for h in next(rows, ())]
+        return [dict(zip(header, r)) for r in rows if any(v is not None for v in r)]
+    finally:
+        workbook.close()
+
+def build_sections(rows, iface, queues=None):
+    """Rows (read_rows() or load_sections().to_dict("records")) as
+    {section: {subsection: {command, type, cache, output, status, reason}}} in sheet order.
+
+    {iface} becomes the given interface; {queue} rows expand to one subsection per queue of it.
+    """
+    sections = {}
+    for row in rows:
+        title = _text(row.get("Section_Title"))
+        if not title:
+            continue  # Skip completely empty rows
+        subtitle = _text(row.get("Subsection_Title")) or "Untitled"
+        cmd_template = _text(row.get("Command"))
+        cmd_type = _text(row.get("Type")).lower() or "static"
+
+        entries = [(subtitle, cmd_template.replace("{iface}", iface))]
+        if "{queue}" in cmd_template:
+            entries = [(name, cmd) for name, cmd, _, _ in expand(subtitle, cmd_template, [iface], queues)] or \
+                      [(subtitle.replace("{iface}", iface).replace("{queue}", "0"), entries[0][1].replace("{queue}", "0"))]
+
+        subs = sections.setdefault(title, {})
+        for name, cmd in entries:
+            subs[name] = {
+                "command": cmd,
+                "type": cmd_type,
+                "cache": parse_policy(row.get("Cache")),
+                "output": "",
+                "status": "Pending",
+                "reason": ""
+            }
+    return sections
+
+def metric_records(rows):
+    """Records for engine.registry.build_registry (the columns data.load_dynamic_df() adds)."""
+    records = []
+    for row in rows:
+        row_type = _text(row.get("Type")).lower()
+        parser = _text(row.get("Parser"))
+        if row_type != "dynamic_single" and not (row_type == "dynamic_multi" and parser):
+            continue
+        records.append({
+            "Section_Title": _text(row.get("Section_Title")),
+            "Subsection_Title": _text(row.get("Subsection_Title")),
+            "Command": _text(row.get("Command")),
+            "command": _text(row.get("Command")),
+            "parser": parser if row_type == "dynamic_multi" else "",
+            "unit": _text(row.get("Unit")),
+            "min_thresh": _float(row.get("Threshold_Min")),
+            "max_thresh": _float(row.get("Threshold_Max")),
+            "alert_for": _float(row.get("Alert_For")),
+            "hysteresis": _float(row.get("Hysteresis")),
+            "rate_max": _float(row.get("Rate_Max")),
+            "counter": _float(row.get("Counter")),
+            "threshold_on": _text(row.get("Threshold_On")).lower(),
+        })
+    return records
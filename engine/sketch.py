@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+# Mergeable quantile sketch: log-spaced histogram bins with bounded relative error
+# (HDR / DDSketch style). Every value lands in bin ceil(log_gamma(|v|)); a quantile is the
+# representative of the bin holding that rank, within RELATIVE_ACCURACY of the true value.
+# Merging is adding bin counts, so per-bucket sketches combine into any window exactly.
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+MIN_MAGNITUDE = 1e-9    # smaller magnitudes count as zero
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p99.9": 0.999}
+
+class LogHistogram:
+    """Sparse log histogram; bins are keyed 2*index (+1 for negative values)."""
+
+    __slots__ = ("bins", "zeros", "count")
+
+    def __init__(self):
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        if value != value:
+            return
+        self.count += 1
+        magnitude = abs(value)
+        if magnitude < MIN_MAGNITUDE:
+            self.zeros += 1
+            return
+        key = 2 * math.ceil(math.log(magnitude) / _LOG_GAMMA) + (value < 0)
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _ordered(self):
+        """(value, count) from smallest to largest."""
+        negative = sorted(((k >> 1, n) for k, n in self.bins.items() if k & 1), reverse=True)
+        positive = sorted((k >> 1, n) for k, n in self.bins.items() if not k & 1)
+        for index, n in negative:
+            yield -_representative(index), n
+        if self.zeros:
+            yield 0.0, self.zeros
+        for index, n in positive:
+            yield _representative(index), n
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, n in self._ordered():
+            seen += n
+            if seen > rank:
+                return value
+        return value
+
+    def quantiles(self, qs=QUANTILES):
+        return {name: self.quantile(q) for name, q in qs.items()}
+
+    def to_lists(self):
+        """(keys, counts) for storage; the zero count is stored next to them."""
+        keys = sorted(self.bins)
+        return keys, [self.bins[k] for k in keys]
+
+    @classmethod
+    def from_lists(cls, keys, counts, zeros=0):
+        sketch = cls()
+        if keys:
+            sketch.bins = dict(zip(keys, counts))
+        sketch.zeros = zeros or 0
+        sketch.count = sum(sketch.bins.values()) + sketch.zeros
+        return sketch
+
+def _representative(index):
+    """Value reported for bin index: the point with equal relative error to both bin edges."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+def merge_arrays(keys, counts, zeros=0):
+    """One LogHistogram from the concatenated bins of many sketches (numpy arrays, keys may repeat)."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+    return LogHistogram.from_lists(unique.tolist(), totals.tolist(), int(zeros))
@@ -0,0 +1,173 @@
+import difflib
+import hashlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+
+# Content-addressed store for "Collect System Information" runs:
+#   <root>/objects/ab/cdef...   zlib-compressed command output, named by the sha256 of the text
+#   <root>/snapshots/<id>.json  manifest: {section: {subsection: {command, status, reason, hash}}}
+# An output that did not change since the last run (lscpu, dmidecode, ...) is stored once,
+# so a new snapshot of an unchanged box costs only its manifest.
+
+SNAPSHOT_DIR = "system_snapshots"
+CHUNK = 1 << 16
+
+class SnapshotStore:
+    """Append-only snapshots of collected sections with per-output deduplication."""
+
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.manifests = os.path.join(root, "snapshots")
+
+    # TODO: Objects
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def put(self, text):
+        """Store text once; returns its sha256 hex digest."""
+        data = text.encode("utf-8", "replace")
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.has(digest):
+            self.put_file(io.BytesIO(data))
+        return digest
+
+    def put_file(self, f):
+        """Store a binary file object's contents (from its start) in chunks; returns the digest."""
+        f.seek(0)
+        sha = hashlib.sha256()
+        compressor = zlib.compressobj(6)
+        os.makedirs(self.objects, exist_ok=True)
+        tmp = os.path.join(self.objects, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                sha.update(chunk)
+                out.write(compressor.compress(chunk))
+            out.write(compressor.flush())
+        digest = sha.hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        return digest
+
+    def has(self, digest):
+        return os.path.exists(self._object_path(digest))
+
+    def chunks(self, digest):
+        """Decompressed contents as a stream of bytes chunks (nothing if the object is missing)."""
+        try:
+            f = open(self._object_path(digest), "rb")
+        except OSError:
+            return
+        decompressor = zlib.decompressobj()
+        with f:
+            try:
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    yield decompressor.decompress(chunk)
+                yield decompressor.flush()
+            except zlib.error:
+                return
+
+    def get(self, digest):
+        return b"".join(self.chunks(digest)).decode("utf-8", "replace")
+
+    # TODO: Snapshots
+
+    def save(self, sections, when=None):
+        """Persist collected sections ({title: {subtitle: {command, output, status, reason}}}); returns the snapshot id."""
+        when = when or datetime.now()
+        manifest = {"time": when.isoformat(timespec="seconds"), "host": socket.gethostname(), "sections": {}}
+        for title, subs in sections.items():
+            entries = manifest["sections"][title] = {}
+            for subtitle, data in subs.items():
+                entries[subtitle] = {
+                    "command": data.get("command", ""),
+                    "status": data.get("status", ""),
+                    "reason": data.get("reason", ""),
+                    # spooled outputs are already in the store; only small ones (fallback text) are added here
+                    "hash": data.get("hash") or self.put(data.get("output", "")),
+                }
+        os.makedirs(self.manifests, exist_ok=True)
+        snapshot_id = when.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.manifests, snapshot_id + ".json")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.manifests, f"{snapshot_id}-{n}.json")
+            n += 1
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+        return os.path.basename(path)[:-len(".json")]
+
+    def ids(self):
+        """Snapshot ids, newest first."""
+        try:
+            names = os.listdir(self.manifests)
+        except OSError:
+            return []
+        return sorted((n[:-len(".json")] for n in names if n.endswith(".json")), reverse=True)
+
+    def manifest(self, snapshot_id):
+        with open(os.path.join(self.manifests, snapshot_id + ".json")) as f:
+            return json.load(f)
+
+    def load(self, snapshot_id):
+        """Sections of a snapshot with their outputs, in the same shape save() took."""
+        sections = {}
+        for title, subs in self.manifest(snapshot_id)["sections"].items():
+            sections[title] = {
+                subtitle: {**{k: v for k, v in e.items() if k != "hash"}, "output": self.get(e["hash"])}
+                for subtitle, e in subs.items()
+            }
+        return sections
+
+    def export_report(self, snapshot_id):
+        """The plain-text report of a snapshot, written to a temporary file (returned open at its start)."""
+        manifest = self.manifest(snapshot_id)
+        f = tempfile.TemporaryFile()
+        f.write(f"System metrics collection started at {manifest['time']}\n\n".encode())
+        for title, subs in manifest["sections"].items():
+            f.write(f"\n=== {title} ===\n".encode())
+            for subtitle, e in subs.items():
+                if not e["command"].strip():
+                    continue
+                f.write(f"\n--- {subtitle} ---\n".encode())
+                for chunk in self.chunks(e["hash"]):
+                    f.write(chunk)
+        f.seek(0)
+        return f
+
+    def diff(self, old_id, new_id, context=2):
+        """[(section, subsection, change, unified diff)] between two snapshots.
+
+        change is "added", "removed" or "changed"; outputs are only read for entries whose hash differs.
+        """
+        old = self.manifest(old_id)["sections"]
+        new = self.manifest(new_id)["sections"]
+        changes = []
+        for title in list(old) + [t for t in new if t not in old]:
+            a, b = old.get(title, {}), new.get(title, {})
+            for subtitle in list(a) + [s for s in b if s not in a]:
+                before, after = a.get(subtitle), b.get(subtitle)
+                if before is None:
+                    changes.append((title, subtitle, "added", ""))
+                elif after is None:
+                    changes.append((title, subtitle, "removed", ""))
+                elif before["hash"] != after["hash"]:
+                    lines = difflib.unified_diff(
+                        self.get(before["hash"]).splitlines(), self.get(after["hash"]).splitlines(),
+                        old_id, new_id, n=context, lineterm=""
+                    )
+                    changes.append((title, subtitle, "changed", "\n".join(lines)))
+        return changes
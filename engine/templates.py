@@ -0,0 +1,72 @@
+import os
+import re
+
+# Metric templates: {iface} and {queue} in a row's Command (and Subsection_Title) expand to every
+# network interface and every queue of it, read from /sys/class/net/<iface>/queues/{rx,tx}-N.
+# The expansions of one row share their base command per interface (e.g. one `ethtool -S eth0`),
+# so the planner still runs it once per tick.
+
+SYS_CLASS_NET = "/sys/class/net"
+AGGREGATES = ("sum", "max", "imbalance")
+
+def list_interfaces(root=SYS_CLASS_NET):
+    """Non-loopback interfaces; physical NICs (with a device link) when there are any."""
+    try:
+        names = sorted(n for n in os.listdir(root) if n != "lo")
+    except OSError:
+        return []
+    physical = [n for n in names if os.path.exists(os.path.join(root, n, "device"))]
+    return physical or names
+
+def list_queues(iface, kind="rx", root=SYS_CLASS_NET):
+    """Queue numbers of one direction (rx-0, rx-1, ... -> [0, 1, ...])."""
+    try:
+        entries = os.listdir(os.path.join(root, iface, "queues"))
+    except OSError:
+        return []
+    prefix = kind + "-"
+    return sorted(int(e[len(prefix):]) for e in entries if e.startswith(prefix) and e[len(prefix):].isdigit())
+
+def queue_kind(command):
+    return "tx" if re.search(r"tx\w*\{queue\}", command) else "rx"
+
+def is_template(text):
+    return "{iface}" in text or "{queue}" in text
+
+def expand(title, command, interfaces=None, queues=None):
+    """[(metric name, command, iface, queue)] for every expansion of a row (one entry if no placeholders).
+
+    interfaces and queues (iface, kind -> [numbers]) default to this machine's; engine.fleet passes a remote host's.
+    """
+    if not is_template(command):
+        return [(title, command, None, None)]
+    if interfaces is None:
+        interfaces = list_interfaces()
+    queues = queues or list_queues
+    expansions = []
+    for iface in interfaces:
+        numbers = queues(iface, queue_kind(command)) if "{queue}" in command else [None]
+        for queue in numbers:
+            def fill(text):
+                return text.replace("{iface}", iface).replace("{queue}", "" if queue is None else str(queue))
+            if is_template(title):
+                name = fill(title)
+            else:
+                name = " ".join([title, iface] + ([] if queue is None else [f"queue {queue}"]))
+            expansions.append((name, fill(command), iface, queue))
+    return expansions
+
+def aggregate_name(title, iface):
+    """Per-interface name for a queue template: "{iface} rx_queue_{queue}_bytes" -> "eth0 rx_queue_*_bytes"."""
+    if is_template(title):
+        return title.replace("{iface}", iface).replace("{queue}", "*")
+    return f"{title} {iface} all queues"
+
+def aggregate(values):
+    """sum / max / imbalance (max over mean; 1.0 = evenly spread) of one interface's queue values."""
+    values = [v for v in values if v == v]
+    if not values:
+        return {name: float("nan") for name in AGGREGATES}
+    total = sum(values)
+    mean = total / len(values)
+    return {"sum": total, "max": max(values), "imbalance": max(values) / mean if mean else float("nan")}
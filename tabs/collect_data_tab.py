@@ -1,9 +1,10 @@
 import streamlit as st
-import subprocess
 import time
-from collections import OrderedDict
-import io
-from data import load_sections, get_default_interface, collect_redfish_sections, get_redfish_groups, test_redfish_connection
+from data import load_sections, collect_redfish_sections, get_redfish_groups, test_redfish_connection, get_snapshot_store
+from engine.collector import HEAD_BYTES, TAIL_BYTES, OutputCache, collect, record
+from engine.facts import extract_facts
+from engine.sheet import build_sections
+from engine.templates import list_interfaces
 import os
 import json
 
@@ -31,8 +32,8 @@ def render_collect_data_tab():
 
     # TODO: Variables to save in session state
 
-    if 'full_report' not in st.session_state:
-        st.session_state.full_report = None
+    if 'report_snapshot' not in st.session_state:
+        st.session_state.report_snapshot = None
     if 'summary_text' not in st.session_state:
         st.session_state.summary_text = None
     if 'has_content' not in st.session_state:
@@ -40,61 +41,27 @@ def render_collect_data_tab():
 
     # TODO: Collect Information
 
+    refresh_all = st.checkbox(
+        "Re-run cached commands",
+        value=False,
+        help="Rows with a Cache policy (reboot / ttl:N) normally reuse their last output while it is valid"
+    )
+
     if st.button("Collect System Information", type="primary"):
 
         with st.spinner("Collecting system info..."):
 
-            #TODO: Start creating the report
-
-            output = io.StringIO()
-            output.write(f"System metrics collection started at {time.ctime()}\n\n")
+            # Detect users interface (physical NICs first), later used in each command
 
-            # Detect users interface , later used in each command
-
-            iface = get_default_interface()
-            if not iface:
-                iface = "unknown"
-            output.write("Warning: No network interface detected (excluding lo).\n\n")
+            interfaces = list_interfaces()
+            iface = interfaces[0] if interfaces else "unknown"
 
             # TODO: Load and build sections
 
             try:
                 df = load_sections()
-                sections = {} # Preserves insertion order (section order from Excel)
-
-                for _, row in df.iterrows():
-                    title = str(row["Section_Title"]).strip()
-                    subtitle = str(row["Subsection_Title"]).strip()
-                    cmd_template = str(row.get("Command", "")).strip()
-                    cmd_type = str(row.get("Type", "static")).strip()
-
-                    # Clean up possible 'nan' from empty cells
-                    if subtitle.lower() == "nan":
-                        subtitle = "Untitled"
-                    if cmd_template.lower() == "nan":
-                        cmd_template = ""
-                    if cmd_type.lower() == "nan":
-                        cmd_type = "static"
-                    # Skip completely empty rows
-                    
-                    if not title:
-                        continue
-
-                    # Replace {iface}
-                    cmd = cmd_template.replace("{iface}", iface)
-
-                    # Initialize section and subsection
-                    if title not in sections:
-                        sections[title] = OrderedDict()
-
-                    sections[title][subtitle] = {
-                        "command": cmd,
-                        "type": cmd_type,
-                        "output": "",
-                        "status": "Pending",
-                        "reason": ""
-                                            }
-                
+                # Preserves insertion order (section order from Excel); {queue} rows expand per queue
+                sections = build_sections(df.to_dict("records"), iface)
                 st.session_state.sections = sections
 
             except Exception as e:
@@ -103,37 +70,41 @@ def render_collect_data_tab():
 
             # TODO: Report
 
-            for title in sections:
-                output.write(f"\n=== {title} ===\n")
-                for subtitle, data in sections[title].items():
-                    cmd = data["command"]
-                    if not cmd.strip():
-                        continue # Skip empty commands (e.g., placeholder rows)
-                    output.write(f"\n--- {subtitle} ---\n")
-                    try:
-                        out_txt = subprocess.check_output(
-                            cmd, shell=True, text=True, stderr=subprocess.STDOUT
-                                            )
-                        data["output"] = out_txt
-                        data["status"] = "Success"
-                        data["reason"] = ""
-                        # Special case: empty sensors output
-                        if cmd.strip() == "sensors" and not out_txt.strip():
-                            raise subprocess.CalledProcessError(1, cmd)
-                    except subprocess.CalledProcessError:
-                        data["status"] = "Failed"
-                        data["reason"] = "Command failed or no output"
-                        first_word = cmd.split()[0] if cmd.split() else ""
-                        fallback = {
-                            "sensors": "No sensors data available (install lm-sensors or check host if VM)\n"
-                                            }.get(first_word, "Command failed or no output\n")
-                        data["output"] = fallback
-                    output.write(data["output"])
-            full_report = output.getvalue()
+            ## Run every command concurrently (bounded pool, per-command deadline); outputs spool
+            ## into the snapshot store and only a head/tail preview is kept in the session
+
+            jobs = {
+                (title, subtitle): data["command"]
+                for title in sections for subtitle, data in sections[title].items()
+                if data["command"].strip()  # Skip empty commands (e.g., placeholder rows)
+            }
+            progress = st.progress(0.0, text=f"Running {len(jobs)} commands...")
+            live = st.empty()
+            finished = []
+            started = time.monotonic()
+            policies = {key: sections[key[0]][key[1]]["cache"] for key in jobs}
+            store = get_snapshot_store()
+            results = collect(jobs, store=store, cache=OutputCache(store), policies=policies, refresh=refresh_all)
+            for n, ((title, subtitle), result) in enumerate(results, start=1):
+                data = record(sections[title][subtitle], result)
+
+                icon = {"Success": "✅", "Timeout": "⏱️"}.get(data["status"], "❌")
+                took = "cached" if result["cached"] else f"{result['elapsed']:.1f}s"
+                finished.append(f"{icon} **{subtitle}** ({took})")
+                progress.progress(n / len(jobs), text=f"{n}/{len(jobs)} commands done")
+                live.markdown("  \n".join(reversed(finished[-8:])))
+            progress.empty()
+            live.empty()
+
+            elapsed = time.monotonic() - started
+
+            ## Structured facts (lscpu, ethtool, numactl, dmidecode, ...), parsed once from the full outputs
+
+            st.session_state.facts = extract_facts(sections, store.get)
 
             # TODO: Summary display
 
-            summary_text = "### Data Collection Summary\n\n"
+            summary_text = f"### Data Collection Summary\n\n{len(jobs)} commands in {elapsed:.1f}s\n\n"
             has_content = False
             for title in sections:
                 section_has_items = any(
@@ -145,33 +116,88 @@ def render_collect_data_tab():
                     for subtitle, data in sections[title].items():
                         if not data["command"].strip():
                             continue
-                        icon = "✅" if data["status"] == "Success" else "❌"
+                        icon = {"Success": "✅", "Timeout": "⏱️"}.get(data["status"], "❌")
                         reason_part = f" ({data['reason']})" if data["reason"] else ""
                         summary_text += f"{icon} **{subtitle}** → `{data['command']}`{reason_part}\n\n"
                     summary_text += "---\n\n"
 
             # Store results in session state
-            st.session_state.full_report = full_report
             st.session_state.summary_text = summary_text
             st.session_state.has_content = has_content
 
+            # Persist the run (unchanged outputs are deduplicated by content hash); the full
+            # report is rebuilt from the snapshot when viewed or downloaded
+            try:
+                st.session_state.report_snapshot = store.save(sections)
+            except OSError as e:
+                st.session_state.report_snapshot = None
+                st.warning(f"Could not save snapshot: {e}")
+
     # TODO: Display results 
 
-    if st.session_state.full_report:
-        
+    if st.session_state.report_snapshot:
+
+        store = get_snapshot_store()
+        snapshot_id = st.session_state.report_snapshot
+        sections = st.session_state.get("sections", {})
+
         if st.session_state.has_content:
             st.markdown(st.session_state.summary_text)
-        
+
         with st.expander("📄 View Detailed Report (raw output)", expanded=False):
-            st.code(st.session_state.full_report, language=None)
-        
+            preview = ""
+            shortened = {}
+            for title, subs in sections.items():
+                preview += f"\n=== {title} ===\n"
+                for subtitle, data in subs.items():
+                    if not data["command"].strip():
+                        continue
+                    preview += f"\n--- {subtitle} ---\n{data['output']}"
+                    if data.get("hash") and data.get("bytes", 0) > HEAD_BYTES + TAIL_BYTES:
+                        shortened[f"{title} / {subtitle} ({data['bytes'] / 1024:,.0f} KB)"] = data["hash"]
+            if shortened:
+                st.caption(f"{len(shortened)} long outputs are shortened to their first and last lines below.")
+                choice = st.selectbox("Load a full output", ["—"] + list(shortened), key="full_output_choice")
+                if choice != "—":
+                    st.code(store.get(shortened[choice]), language=None)
+            st.code(preview.strip(), language=None)
+
+        if st.session_state.get("facts"):
+            with st.expander(f"🧩 Parsed facts ({len(st.session_state.facts)})", expanded=False):
+                st.json(st.session_state.facts, expanded=1)
+
         st.download_button(
             label="💾 Download Report as system_info.txt",
-            data=st.session_state.full_report,
+            data=lambda: store.export_report(snapshot_id),
             file_name="system_info.txt",
             mime="text/plain"
         )
 
+    # TODO: Snapshots
+
+    store = get_snapshot_store()
+    snapshot_ids = store.ids()
+    if len(snapshot_ids) >= 2:
+        with st.expander(f"🕓 Compare snapshots ({len(snapshot_ids)} saved)", expanded=False):
+            col_old, col_new = st.columns(2)
+            with col_old:
+                old_id = st.selectbox("Older", snapshot_ids, index=1, key="snapshot_old")
+            with col_new:
+                new_id = st.selectbox("Newer", snapshot_ids, index=0, key="snapshot_new")
+            if old_id == new_id:
+                st.info("Pick two different snapshots.")
+            else:
+                changes = store.diff(old_id, new_id)
+                if not changes:
+                    st.success("✅ No differences")
+                else:
+                    st.write(f"**{len(changes)}** subsections differ")
+                    icons = {"added": "➕", "removed": "➖", "changed": "✏️"}
+                    for title, subtitle, change, diff_text in changes:
+                        st.markdown(f"{icons[change]} **{title} / {subtitle}** ({change})")
+                        if diff_text:
+                            st.code(diff_text, language="diff")
+
     # TODO: Redfish Section
 
     st.divider()
@@ -2,7 +2,13 @@
 import streamlit as st
 import pandas as pd
 import os
-from datetime import timedelta
+import numpy as np
+from datetime import datetime, timedelta
+
+from data import get_history_stores
+from engine.downsample import MAX_CHART_POINTS, minmax
+from engine.rollup import choose_resolution, summarize
+from engine.sketch import QUANTILES
 
 @st.fragment
 def render_history_tab():
@@ -12,24 +18,27 @@ def render_history_tab():
     """)
 
     csv_file = "monitoring_history.csv"
-
-    if not os.path.isfile(csv_file):
-        st.info("No monitoring history found yet. Start collecting data in the Live Monitoring tab to populate this section.")
-        return
-
-    # Load data
-    try:
-        hist_df = pd.read_csv(csv_file)
-        hist_df["timestamp"] = pd.to_datetime(hist_df["timestamp"])
-    except Exception as e:
-        st.error(f"Error loading history: {e}")
-        return
-
-    if hist_df.empty:
-        st.info("History file is empty — start monitoring to collect data.")
+    store, rollups = get_history_stores()
+
+    if store.is_empty():
+        if os.path.isfile(csv_file):
+            st.info("History is now kept in a partitioned Parquet store. Import the existing CSV to analyze it here.")
+            if st.button("Import monitoring_history.csv", type="primary"):
+                with st.spinner("Importing history..."):
+                    try:
+                        count = store.import_csv(csv_file)
+                    except Exception as e:
+                        st.error(f"Error importing history: {e}")
+                        return
+                st.success(f"✅ Imported {count} rows")
+                st.rerun()
+        else:
+            st.info("No monitoring history found yet. Start collecting data in the Live Monitoring tab to populate this section.")
         return
 
-    available_metrics = sorted(hist_df["metric"].unique().tolist())
+    # Load metric index (per-metric unit / first / last / count, no data scan)
+    index = store.index()
+    available_metrics = sorted(index)
 
     if not available_metrics:
         st.info("No metrics in history yet.")
@@ -38,56 +47,100 @@ def render_history_tab():
     # Metric selector
     selected = st.selectbox("Select metric for detailed historical view", available_metrics)
 
-    metric_df = hist_df[hist_df["metric"] == selected].copy()
-    if metric_df.empty:
-        st.info(f"No data for metric '{selected}'.")
-        return
-
-    # Time range handling
-    timestamps = metric_df["timestamp"]
-    min_t = timestamps.min().to_pydatetime()
-    max_t = timestamps.max().to_pydatetime()
+    entry = index[selected]
+    min_t = datetime.fromisoformat(entry["first"]).replace(microsecond=0)
+    max_t = datetime.fromisoformat(entry["last"]).replace(microsecond=0) + timedelta(seconds=1)
 
-    st.markdown(f"**{selected}** — Data points: {len(metric_df)} | Range: {min_t.strftime('%Y-%m-%d %H:%M')} to {max_t.strftime('%Y-%m-%d %H:%M')}")
+    st.markdown(f"**{selected}** — Data points: {entry['count']} | Range: {min_t.strftime('%Y-%m-%d %H:%M')} to {max_t.strftime('%Y-%m-%d %H:%M')}")
 
-    if len(metric_df) <= 1 or min_t == max_t:
+    if entry["count"] <= 1 or min_t == max_t:
         st.info("Not enough data points for time range selection — showing all available data.")
+        metric_df = store.query(selected).to_pandas()
         st.line_chart(metric_df.set_index("timestamp")["value"], width='content')
+        return
+
+    # Default to last 24 hours if history is long, otherwise full range
+    default_end = max_t
+    default_start = max_t - timedelta(hours=24)
+    if default_start < min_t:
+        default_start = min_t
+
+    time_range = st.slider(
+        "Zoom to time range",
+        min_value=min_t,
+        max_value=max_t,
+        value=(default_start, default_end),
+        format="MM/DD HH:mm",
+        key=f"history_slider_{selected}"
+    )
+
+    # Long windows come from the 1m / 1h rollups; short ones from raw samples.
+    # Only the selected metric and the partitions overlapping the range are read.
+    resolution = choose_resolution(time_range[0], time_range[1])
+    try:
+        if resolution:
+            rollup_df = rollups.query(selected, resolution, time_range[0], time_range[1])
+            if len(rollup_df) == 0:
+                resolution = None  # history recorded before rollups existed
+        if resolution:
+            stats = summarize(rollup_df)
+            view_df = rollup_df.select(["timestamp", "min", "max", "sum", "count"]).to_pandas()
+            view_df["mean"] = view_df["sum"] / view_df["count"]
+            view_df = view_df[["timestamp", "min", "mean", "max"]]
+        else:
+            view_df = store.query(selected, time_range[0], time_range[1]).to_pandas()
+            values = view_df["value"].dropna()
+            stats = {"count": len(values), "min": values.min(), "max": values.max(), "mean": values.mean(), "std": values.std()}
+        # Tail percentiles come from merging the 1m bucket sketches
+        percentiles = rollups.percentiles(selected, "1m", time_range[0], time_range[1])
+        if resolution is None and all(np.isnan(v) for v in percentiles.values()) and stats["count"]:
+            percentiles = {name: np.percentile(values, q * 100) for name, q in QUANTILES.items()}
+    except Exception as e:
+        st.error(f"Error loading history: {e}")
+        return
+
+    # Reduce to the chart's point budget; per-bucket min and max are kept so spikes stay visible
+    total_points = len(view_df)
+    if resolution:
+        x = view_df["timestamp"].to_numpy()
+        keep = np.union1d(minmax(x, view_df["min"].to_numpy(), MAX_CHART_POINTS // 2),
+                          minmax(x, view_df["max"].to_numpy(), MAX_CHART_POINTS // 2))
     else:
-        # Default to last 24 hours if history is long, otherwise full range
-        default_end = max_t
-        default_start = max_t - timedelta(hours=24)
-        if default_start < min_t:
-            default_start = min_t
-
-        time_range = st.slider(
-            "Zoom to time range",
-            min_value=min_t,
-            max_value=max_t,
-            value=(default_start, default_end),
-            format="MM/DD HH:mm",
-            key=f"history_slider_{selected}"
-        )
-
-        view_df = metric_df[
-            (metric_df["timestamp"] >= pd.Timestamp(time_range[0])) &
-            (metric_df["timestamp"] <= pd.Timestamp(time_range[1]))
-        ]
-
-        if view_df.empty:
-            st.info("No data in selected time range.")
+        keep = minmax(view_df["timestamp"].to_numpy(), view_df["value"].to_numpy())
+    view_df = view_df.iloc[keep]
+
+    if view_df.empty:
+        st.info("No data in selected time range.")
+    else:
+        if resolution:
+            st.caption(f"Showing {resolution} rollups ({total_points} buckets, {stats['count']} samples)")
+            st.line_chart(view_df.set_index("timestamp"), width='content')
         else:
+            if len(view_df) < total_points:
+                st.caption(f"Showing {len(view_df)} of {total_points} samples (min/max per pixel bucket)")
             st.line_chart(view_df.set_index("timestamp")["value"], width='content')
 
-            # Basic stats for the visible range
-            values = view_df["value"].dropna()
-            if not values.empty:
-                col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
-                with col_stat1:
-                    st.metric("Min", f"{values.min():.4f}")
-                with col_stat2:
-                    st.metric("Max", f"{values.max():.4f}")
-                with col_stat3:
-                    st.metric("Average", f"{values.mean():.4f}")
-                with col_stat4:
-                    st.metric("Std Dev", f"{values.std():.4f}")
+        # Basic stats for the visible range
+        if stats["count"]:
+            col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
+            with col_stat1:
+                st.metric("Min", f"{stats['min']:.4f}")
+            with col_stat2:
+                st.metric("Max", f"{stats['max']:.4f}")
+            with col_stat3:
+                st.metric("Average", f"{stats['mean']:.4f}")
+            with col_stat4:
+                st.metric("Std Dev", f"{stats['std']:.4f}")
+
+            col_p50, col_p99, col_p999, _ = st.columns(4)
+            for col, name in ((col_p50, "p50"), (col_p99, "p99"), (col_p999, "p99.9")):
+                with col:
+                    st.metric(name, f"{percentiles[name]:.4f}" if pd.notna(percentiles[name]) else "—")
+
+    # Optional CSV export of the whole store (generated only when clicked)
+    st.download_button(
+        "💾 Export Full History as CSV",
+        data=store.export_csv,
+        file_name="monitoring_history.csv",
+        mime="text/csv"
+    )
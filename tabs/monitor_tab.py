@@ -1,14 +1,16 @@
 # monitor_tab.py
 import streamlit as st
-import subprocess
-import time
-import csv
 import os
 import pandas as pd
 from datetime import datetime
 
-from data import load_sections, load_dynamic_df
+from data import load_sections, load_dynamic_df, load_metric_registry, get_sampler
 from ai import get_ai_threshold
+from engine.sampler import MAX_POINTS, HIGH_RES_POINTS
+from engine.downsample import MAX_CHART_POINTS, downsample
+from engine.rates import RATE_SUFFIX
+
+LOCAL_TZ = datetime.now().astimezone().tzinfo
 
 @st.fragment
 def render_monitor_tab():
@@ -16,7 +18,7 @@ def render_monitor_tab():
     st.header("Live System Monitoring")
 
     st.markdown("""
-    Tracks `dynamic_single` numeric metrics from your Excel config.  
+    Tracks `dynamic_single` numeric metrics and `dynamic_multi` metric families (rows with a `Parser`) from your Excel config.  
     Select metrics to monitor/log/alert on (all enabled by default), and choose which to graph live.
     """)
 
@@ -55,16 +57,16 @@ def render_monitor_tab():
 
     # TODO: Session state
 
+    sampler = get_sampler()  # shared by every viewer: new sessions start from what it is running
+
     if "monitoring_running" not in st.session_state:
         st.session_state.monitoring_running = False
-    if "monitor_history" not in st.session_state:
-        st.session_state.monitor_history = {}
-    if "active_alerts" not in st.session_state:
-        st.session_state.active_alerts = {}
+    single_metrics = list(dynamic_df.loc[dynamic_df["parser"] == "", "Subsection_Title"])
     if "monitored_metrics" not in st.session_state:
-        st.session_state.monitored_metrics = list(dynamic_df["Subsection_Title"])
+        # families can emit hundreds of series: opt-in
+        st.session_state.monitored_metrics = sampler.metrics[:] if sampler.metrics else single_metrics[:]
     if "displayed_metrics" not in st.session_state:
-        st.session_state.displayed_metrics = list(dynamic_df["Subsection_Title"])
+        st.session_state.displayed_metrics = single_metrics[:]
 
     # TODO: Metrics to Monitor
 
@@ -88,6 +90,7 @@ def render_monitor_tab():
 
     ## Display metrics
 
+    registry = load_metric_registry()
     groups = dynamic_df.groupby("Section_Title")
         
     monitored = {}
@@ -104,6 +107,19 @@ def render_monitor_tab():
                 thresh_display = f"Min: {min_str} | Max: {max_str}"
                 if unit:
                     thresh_display += f" ({unit})"
+                if row["threshold_on"] == "rate":
+                    thresh_display += " per second"
+                if pd.notna(row["alert_for"]):
+                    thresh_display += f" · for {row['alert_for']:g}s"
+                if pd.notna(row["hysteresis"]):
+                    thresh_display += f" · hysteresis {row['hysteresis']:g}"
+                if pd.notna(row["rate_max"]):
+                    thresh_display += f" · rate ≤ {row['rate_max']:g}/s"
+                if row["parser"]:
+                    thresh_display += f" · metric family, parser `{row['parser'].split(':')[0]}`"
+                spec = registry.get(subtitle)
+                if spec is not None and spec.is_template:
+                    thresh_display += f" · {len(spec.expansions)} interfaces/queues"
 
                 default = subtitle in st.session_state.monitored_metrics
                 monitored[subtitle] = st.checkbox(
@@ -172,143 +188,170 @@ def render_monitor_tab():
 
     ## Interval
 
-    interval = st.selectbox("Update interval", [10, 30, 60, 300], index = 0 , format_func = lambda x: f"{x} seconds")
+    st.session_state.monitoring_running = sampler.running
+
+    high_res = st.toggle(
+        "High-resolution mode (sub-second sampling)",
+        value=sampler.max_points == HIGH_RES_POINTS,
+        help="Samples drops and queue counters every 100 ms – 1 s into preallocated ring buffers."
+    )
+    max_points = HIGH_RES_POINTS if high_res else MAX_POINTS
+    interval_options = [0.1, 0.25, 0.5, 1] if high_res else [10, 30, 60, 300]
+
+    interval = st.selectbox("Update interval", interval_options,
+                            index = interval_options.index(sampler.interval) if sampler.interval in interval_options else 0,
+                            format_func = lambda x: f"{x * 1000:g} ms" if x < 1 else f"{x} seconds")
 
     col_ctrl1, col_ctrl2 = st.columns([1, 1])
 
     with col_ctrl1:
         start_label = "Start Monitoring" if not st.session_state.monitoring_running else "Pause Monitoring"
         if st.button(start_label, type="primary", width="stretch"):
-            st.session_state.monitoring_running = not st.session_state.monitoring_running
+            if sampler.running:
+                sampler.pause()
+            else:
+                sampler.configure(registry, st.session_state.monitored_metrics, interval, max_points)
+                sampler.start()
             st.rerun()
     
     with col_ctrl2:
         if st.button("Stop & Clear Live Graphs", type="secondary", width="stretch"):
-            st.session_state.monitoring_running = False
-            st.session_state.monitor_history = {}
-            st.session_state.active_alerts = {}
+            sampler.pause()
+            sampler.clear()
             st.rerun()
     
     if not st.session_state.monitored_metrics:
         st.warning("⚠️ Select at least one metric in 'Metrics to Monitor' to start.")
         st.stop()
 
-    ## Live Monitoring Fragment
+    ## The sampler is shared by every viewer: opening or rerunning the tab never reconfigures it,
+    ## only an explicit Apply does
 
-    @st.fragment
-    def live_monitoring():
-
-        placeholder = st.empty()
-
-        while st.session_state.monitoring_running:
-            with placeholder.container():
-                now = datetime.now()
-                current_values = {}
+    if sampler.running and (sampler.metrics != st.session_state.monitored_metrics or sampler.interval != interval or sampler.max_points != max_points):
+        col_apply1, col_apply2 = st.columns([1, 1])
+        with col_apply1:
+            st.caption(f"Running: {len(sampler.metrics)} metrics every {sampler.interval:g}s. Your selection differs.")
+        with col_apply2:
+            if st.button("Apply to running monitor", type="secondary", width="stretch"):
+                sampler.configure(registry, st.session_state.monitored_metrics, interval, max_points)
+                st.rerun()
 
-                for subtitle in st.session_state.monitored_metrics:
-                    row = dynamic_df[dynamic_df["Subsection_Title"] == subtitle].iloc[0]
-                    cmd = row["command"]
+    ## Live Monitoring Fragment (render only — the background sampler does the collecting)
+    ## Sub-second sampling still redraws at most once per second
 
-                    try:
-                        output = subprocess.check_output(cmd, shell=True, text=True, stderr=subprocess.STDOUT).strip()
-                        value = float(output) if output else float("nan")
-                    except Exception:
-                        value = float("nan")
+    @st.fragment(run_every=max(sampler.interval, 1) if sampler.running else None)
+    def live_monitoring():
 
-                    current_values[subtitle] = value
+        snap = sampler.snapshot(st.session_state.displayed_metrics)
+        current_values = snap["values"]
+        active_alerts = snap["alerts"]
+        anomalies = snap["anomalies"]
 
-                    ### Breach check (thresholds optional)
-                    breached = False
-                    if pd.notna(value):
-                        if pd.notna(row["min_thresh"]) and value < row["min_thresh"]:
-                            breached = True
-                        if pd.notna(row["max_thresh"]) and value > row["max_thresh"]:
-                            breached = True
+        if sampler.last_error:
+            st.warning(f"Sampler error on last tick: {sampler.last_error}")
+        if sampler.writer.last_error:
+            st.warning(f"History writer error: {sampler.writer.last_error}")
 
-                    if breached:
-                        if subtitle not in st.session_state.active_alerts:
-                            st.session_state.active_alerts[subtitle] = (value, now)
+        if snap["time"] is None:
+            if sampler.running:
+                st.info("Waiting for the first sample...")
+            else:
+                st.info("Monitoring paused — press Start Monitoring to begin sampling.")
+            return
+
+        ### Current values table
+        st.markdown(f"#### 📋 Current Values (sampled {snap['time'].strftime('%H:%M:%S')})")
+        table_data = []
+        for subtitle in st.session_state.monitored_metrics:
+            spec = registry.get(subtitle)
+            if spec is None:
+                continue
+            for metric in snap["members"].get(subtitle, [subtitle]):
+                value = current_values.get(metric, float("nan"))
+                status = "❌" if metric in active_alerts else "⏳" if metric in snap["pending"] else "✅"
+                anomaly = anomalies.get(metric)
+                bounded = "*" not in metric  # queue aggregates carry no thresholds
+                table_data.append({
+                    "Metric": metric,
+                    "Value": f"{value:.4f}" if pd.notna(value) else "N/A",
+                    "Unit": spec.unit,
+                    "Min": spec.min_thresh if bounded and pd.notna(spec.min_thresh) else "—",
+                    "Max": spec.max_thresh if bounded and pd.notna(spec.max_thresh) else "—",
+                    "Status": status,
+                    "Anomaly": f"⚡ {anomaly[0]} ({anomaly[1]})" if anomaly else ""
+                })
+        st.dataframe(table_data, width="stretch", hide_index=True)
+
+        ### Alerts
+        st.markdown("#### ⚠️ Active Threshold Breaches")
+        if active_alerts:
+            st.error("One or more metrics are outside thresholds")
+            for sub, (val, since, reason) in active_alerts.items():
+                st.write(f"• **{sub}**: {val:.4f} — {reason} (since {since.strftime('%H:%M:%S')})")
+        else:
+            st.success("✅ All monitored metrics within thresholds")
+
+        ### Anomalies (statistical, independent of the static thresholds)
+        recent = [e for e in sampler.events.tail(200) if e.get("type") == "anomaly"][-10:]
+        if recent:
+            with st.expander(f"⚡ Recent anomalies ({len(anomalies)} active)", expanded=bool(anomalies)):
+                for e in reversed(recent):
+                    st.write(f"• {e['time'][11:19]} **{e['metric']}**: {e['kind']} — {e['detail']}")
+
+        ### Live graphs
+        if st.session_state.displayed_metrics:
+            st.markdown(f"#### 📈 Live Trends (last ~{sampler.max_points} points)")
+            for subtitle in st.session_state.displayed_metrics:
+                if subtitle not in st.session_state.monitored_metrics:
+                    continue
+                series = {}
+                members = snap["members"].get(subtitle, [subtitle])
+                spec = registry.get(subtitle)
+                if spec is not None and spec.has_queues:
+                    members = [m for m in members if m.endswith(" sum")]  # one line per interface, summed over queues
+                elif any(m.endswith(RATE_SUFFIX) for m in members):
+                    members = [m for m in members if m.endswith(RATE_SUFFIX)]  # counters are charted as rates
+                if not members:
+                    continue
+                budget = max(MAX_CHART_POINTS // len(members), 4)  # point budget shared by the chart's series
+                for metric in members:
+                    ts, values = snap["history"].get(metric, ((), ()))
+                    if len(ts):
+                        ts, values = downsample(ts, values, budget)
+                        times = pd.to_datetime(ts, unit="ns", utc=True).tz_convert(LOCAL_TZ).tz_localize(None)
+                        series[metric] = pd.Series(values, index=times)
+                if series:
+                    st.subheader(subtitle)
+                    if len(series) == 1:
+                        st.line_chart(next(iter(series.values())).rename("Value"), width="stretch")
                     else:
-                        st.session_state.active_alerts.pop(subtitle, None)
-
-                    ### Pruned in-memory history
-                    if subtitle not in st.session_state.monitor_history:
-                        st.session_state.monitor_history[subtitle] = []
-                    st.session_state.monitor_history[subtitle].append((now, value))
-                    if len(st.session_state.monitor_history[subtitle]) > 1000:
-                        st.session_state.monitor_history[subtitle] = st.session_state.monitor_history[subtitle][-1000:]
-
-                    ### Persistent CSV append
-                    csv_file = "monitoring_history.csv"
-                    row_data = {
-                        "timestamp": now.isoformat(),
-                        "metric": subtitle,
-                        "value": value if pd.notna(value) else "",
-                        "unit": row["unit"]
-                    }
-                    file_exists = os.path.isfile(csv_file)
-                    with open(csv_file, "a", newline="") as f:
-                        writer = csv.DictWriter(f, fieldnames=["timestamp", "metric", "value", "unit"])
-                        if not file_exists:
-                            writer.writeheader()
-                        writer.writerow(row_data)
-
-                ### Current values table
-                st.markdown("#### 📋 Current Values")
-                table_data = []
-                for subtitle in st.session_state.monitored_metrics:
-                    value = current_values.get(subtitle, float("nan"))
-                    row = dynamic_df[dynamic_df["Subsection_Title"] == subtitle].iloc[0]
-                    status = "❌" if subtitle in st.session_state.active_alerts else "✅"
-                    table_data.append({
-                        "Metric": subtitle,
-                        "Value": f"{value:.4f}" if pd.notna(value) else "N/A",
-                        "Unit": row["unit"],
-                        "Min": row["min_thresh"] if pd.notna(row["min_thresh"]) else "—",
-                        "Max": row["max_thresh"] if pd.notna(row["max_thresh"]) else "—",
-                        "Status": status
-                    })
-                st.dataframe(table_data, width="stretch", hide_index=True)
-
-                ### Alerts
-                st.markdown("#### ⚠️ Active Threshold Breaches")
-                if st.session_state.active_alerts:
-                    st.error("One or more metrics are outside thresholds")
-                    for sub, (val, since) in st.session_state.active_alerts.items():
-                        st.write(f"• **{sub}**: {val:.4f} (since {since.strftime('%H:%M:%S')})")
-                else:
-                    st.success("✅ All monitored metrics within thresholds")
-
-                ### Live graphs
-                if st.session_state.displayed_metrics:
-                    st.markdown("#### 📈 Live Trends (last ~1000 points)")
-                    for subtitle in st.session_state.displayed_metrics:
-                        if subtitle not in st.session_state.monitored_metrics:
-                            continue
-                        history = st.session_state.monitor_history.get(subtitle, [])
-                        if history:
-                            chart_df = pd.DataFrame(history, columns=["Time", "Value"])
-                            st.subheader(subtitle)
-                            st.line_chart(chart_df.set_index("Time")["Value"], width="stretch")
-
-            time.sleep(interval)
+                        st.line_chart(pd.DataFrame(series), width="stretch")
 
         ### Paused state
-        if st.session_state.monitored_metrics:
-            st.info("Monitoring paused — live graphs frozen, full history preserved in CSV.")
+        if not sampler.running:
+            st.info("Monitoring paused — live graphs frozen, full history preserved on disk.")
 
     live_monitoring()
 
     # TODO: History Download
 
-    csv_file = "monitoring_history.csv"
-
-    if os.path.isfile(csv_file):
-        with open(csv_file, "rb") as f:
-            st.download_button(
-                "💾 Download Full History CSV",
-                data=f,
-                file_name="monitoring_history.csv",
-                mime="text/csv",
-                width="stretch"
-            )
\ No newline at end of file
+    csv_export = st.checkbox(
+        "Also append every sample to monitoring_history.csv",
+        value=sampler.csv_export,
+        help="History is stored in hour-partitioned Parquet files under monitoring_history/. The CSV copy is optional."
+    )
+    if csv_export != sampler.csv_export:
+        sampler.set_csv_export(csv_export)
+
+    def export_history():
+        sampler.writer.flush()  # include rows still buffered by the history writer, only when downloading
+        return sampler.store.export_csv()
+
+    if not sampler.store.is_empty():
+        st.download_button(
+            "💾 Download Full History CSV",
+            data=export_history,
+            file_name="monitoring_history.csv",
+            mime="text/csv",
+            width="stretch"
+        )